@@ -1,27 +1,12 @@
-__all__ = ["factory_method"]
+__all__ = ["factory_method", "register_function"]
 
 import os
-import importlib
+import sys
 
+# salpsearch uses flat imports, so it has to be on the path for the registry (and anything it
+# resolves) to be the same module objects the simulation code imports
+_SALPSEARCH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'salpsearch')
+if _SALPSEARCH not in sys.path:
+    sys.path.insert(0, _SALPSEARCH)
 
-def factory_method(name):
-    return __CLASS_DICT__[name]
-
-
-__CLASS_DICT__ = dict()
-
-
-def register_function(name):
-    def register_function_fn(cls):
-        if name in __CLASS_DICT__:
-            raise ValueError("Name %s already registered!" % name)
-        __CLASS_DICT__[name] = cls
-        return cls
-
-    return register_function_fn
-
-
-for file in os.listdir(os.path.dirname(__file__)):
-    if file.endswith('.py') and not file.startswith('_'):
-        module_name = file[:file.find('.py')]
-        module = importlib.import_module('models.' + module_name)
+from registry import factory_method, register_function  # noqa: E402
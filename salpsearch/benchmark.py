@@ -0,0 +1,213 @@
+"""Benchmarks for the simulation hot paths.
+
+    python benchmark.py run --output current.json
+    python benchmark.py compare baseline.json current.json
+    python benchmark.py scaling --output scaling.json
+
+Run from the salpsearch directory. Every benchmark reports the best mean time per call over several repeats.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+import pymunk
+
+from config import (RunConfig, SalpConfig, PhysicsHandlerConfig, PhysicsSpaceConfig, ConcentrationHandlerConfig,
+                    ConcentrationSpaceConfig, LinearChainConfig, RotaryLimitHandlerConfig, SimulationConfig)
+from factories.simulation_factory import SimulationFactory
+from graphs import LinearChain, RingChain, BranchedChain, GridLattice, RandomGraph
+from helpers import FastFunctions, ConcentrationRasterizer
+from simulation import Simulation
+
+DEFAULT_SIZES = [8, 64, 512, 4096, 10000]
+DEFAULT_TOTALS = [1024, 4096, 16384, 32768]
+
+
+def make_config(num_creatures: int, concentration_handler: str = 'FicksConcentrationHandler',
+                num_chains: int = 1, chain_offset: tuple = (0, 40), **simulation) -> RunConfig:
+    space = PhysicsSpaceConfig(space='physics_space', damping=0.8)
+    return RunConfig(
+        salp=SalpConfig(physics_handler=PhysicsHandlerConfig(space=space),
+                        concentration_handler=ConcentrationHandlerConfig(
+                            space=ConcentrationSpaceConfig(origin=(300, 500)), type=concentration_handler),
+                        pos=(400, 400), radius=5, thrust=1000, action_potential_baseline=0.0001,
+                        action_potential_step=0.0003, angle=0),
+        creature_graph=LinearChainConfig(num_creatures=num_creatures, starting_point=(400, 400),
+                                         direction_vector=(-1, 1), distance=15),
+        link_handler=RotaryLimitHandlerConfig(space=space, min=-10, max=10),
+        simulation=SimulationConfig(fps=15, max_time=1e9, seed=0, num_chains=num_chains, chain_offset=chain_offset,
+                                    **simulation))
+
+
+def measure(fn: Callable, min_time: float = 0.2, repeats: int = 3) -> float:
+    """Best mean seconds per call of fn over repeats, each repeat running for at least min_time"""
+    fn()  # warm up, e.g. numba compilation
+    best = float('inf')
+    for _ in range(repeats):
+        calls = 0
+        start = time.perf_counter()
+        elapsed = 0.
+        while elapsed < min_time:
+            fn()
+            calls += 1
+            elapsed = time.perf_counter() - start
+        best = min(best, elapsed / calls)
+    return best
+
+
+def bench_kernels(results: Dict, sizes: List[int]):
+    ff = FastFunctions()
+    rasterizer = ConcentrationRasterizer((800, 800))
+    results['get_concentration_array[800x800]'] = measure(lambda: rasterizer.render((0.3, 0.6), 2., 0.002))
+    for n in sizes:
+        points = np.random.default_rng(0).random((n, 2))
+        point_tuples = [tuple(point) for point in points]
+
+        def ficks_loop():
+            for point in point_tuples:
+                ff.ficks(point, (0.3, 0.6), 2., 0.002)
+
+        results['ficks[%d]' % n] = measure(ficks_loop)
+        results['ficks_many[%d]' % n] = measure(lambda: ff.ficks_many(points, (0.3, 0.6), 2., 0.002))
+
+
+def bench_graphs(results: Dict, sizes: List[int]):
+    """Building edges, CSR adjacency and positions of a fresh graph"""
+    common = {'starting_point': (400, 400), 'direction_vector': (-1, 1), 'distance': 15}
+    for n in sizes:
+        side = max(1, int(round(np.sqrt(n))))
+        topologies = {'LinearChain': lambda: LinearChain(num_creatures=n, **common),
+                      'RingChain': lambda: RingChain(num_creatures=n, **common),
+                      'BranchedChain': lambda: BranchedChain(num_branches=4, branch_length=max(1, n // 4), **common),
+                      'GridLattice': lambda: GridLattice(rows=side, columns=side, **common),
+                      'RandomGraph': lambda: RandomGraph(num_creatures=n, **common)}
+        for name, make_graph in topologies.items():
+            def build():
+                graph = make_graph()
+                return graph.positions, graph.indptr
+
+            results['%s.build[%d]' % (name, n)] = measure(build)
+
+
+def bench_chains(results: Dict, sizes: List[int]):
+    factory = SimulationFactory()
+    for n in sizes:
+        config = make_config(n)
+        results['construction[%d]' % n] = measure(lambda: factory.make_simulation(config), repeats=1)
+
+        # decisions fire impulses into the simulation they run on, so every benchmark starts from a fresh copy
+        checkpoint = factory.make_simulation(config).checkpoint()
+        chain = Simulation.restore(checkpoint).creature_chain
+        concentrations = chain.creature.concentration_handler.get_conc_many(chain.get_positions())
+        results['Salp.jet_decision[%d]' % n] = measure(
+            lambda: [creature.jet_decision(conc) for creature, conc in zip(chain.creature_list, concentrations)])
+        chain = Simulation.restore(checkpoint).creature_chain
+        results['SalpSwarm.jet_decision[%d]' % n] = measure(lambda: chain.swarm.jet_decision(concentrations))
+        results['SalpChain.run_chain[%d]' % n] = measure(Simulation.restore(checkpoint).creature_chain.run_chain)
+        results['Simulation.step[%d]' % n] = measure(Simulation.restore(checkpoint).step)
+
+
+def bench_scaling(results: Dict, totals: List[int], chain_length: int):
+    """Many parallel chains packed side by side about one salp diameter apart, so neighbouring chains
+    interact. Compares the broad phase settings of Simulation"""
+    factory = SimulationFactory()
+    variants = {'': {},
+                'bbtree': {'spatial_hash_threshold': None},
+                'no_self_collision': {'self_collision': False}}
+    for total in totals:
+        num_chains = max(1, total // chain_length)
+        for name, settings in variants.items():
+            config = make_config(chain_length, num_chains=num_chains, chain_offset=(-8, 8), **settings)
+            key = '%d' % (num_chains * chain_length) + (',' + name if name else '')
+            if not name:
+                results['construction[%s]' % key] = measure(lambda: factory.make_simulation(config), repeats=1)
+            simulation = factory.make_simulation(config)
+            # let the chains start moving and touching before timing
+            for _ in range(15):
+                simulation.step()
+            results['Simulation.step[%s]' % key] = measure(simulation.step, repeats=1)
+            results['space.step[%s]' % key] = measure(lambda: simulation.space.step(simulation.dt), repeats=1)
+
+
+def results_document(results: Dict, **meta) -> Dict:
+    meta.update({'timestamp': time.time(),
+                 'python': sys.version.split()[0],
+                 'platform': platform.platform(),
+                 'numpy': np.__version__,
+                 'pymunk': pymunk.version})
+    return {'meta': meta, 'seconds': results}
+
+
+def run(sizes: List[int]) -> Dict:
+    results = {}
+    bench_kernels(results, sizes)
+    bench_graphs(results, sizes)
+    bench_chains(results, sizes)
+    return results_document(results, sizes=sizes)
+
+
+def scaling(totals: List[int], chain_length: int) -> Dict:
+    results = {}
+    bench_scaling(results, totals, chain_length)
+    return results_document(results, totals=totals, chain_length=chain_length)
+
+
+def write(results: Dict, output: str):
+    if output is None:
+        print(json.dumps(results, indent=2))
+    else:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> bool:
+    """Prints a table of time ratios, returns False if anything is slower than baseline by more than threshold"""
+    ok = True
+    print('%-40s %12s %12s %8s' % ('benchmark', 'baseline', 'current', 'ratio'))
+    for name, seconds in current['seconds'].items():
+        if name not in baseline['seconds']:
+            print('%-40s %12s %12.3e %8s' % (name, '-', seconds, 'new'))
+            continue
+        ratio = seconds / baseline['seconds'][name]
+        flag = ''
+        if ratio > 1 + threshold:
+            flag = ' REGRESSION'
+            ok = False
+        print('%-40s %12.3e %12.3e %8.2f%s' % (name, baseline['seconds'][name], seconds, ratio, flag))
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help='run the benchmarks and write JSON results')
+    run_parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='chain sizes')
+    run_parser.add_argument('--output', default=None, help='JSON file to write, printed if omitted')
+    scaling_parser = subparsers.add_parser('scaling', help='step time of many interacting chains')
+    scaling_parser.add_argument('--totals', type=int, nargs='+', default=DEFAULT_TOTALS, help='total salps')
+    scaling_parser.add_argument('--chain-length', type=int, default=64, help='salps per chain')
+    scaling_parser.add_argument('--output', default=None, help='JSON file to write, printed if omitted')
+    compare_parser = subparsers.add_parser('compare', help='compare results against a saved baseline')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.1, help='allowed relative slowdown')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        write(run(args.sizes), args.output)
+    elif args.command == 'scaling':
+        write(scaling(args.totals, args.chain_length), args.output)
+    else:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        with open(args.current) as file:
+            current = json.load(file)
+        sys.exit(0 if compare(baseline, current, args.threshold) else 1)
+
+
+if __name__ == '__main__':
+    main()
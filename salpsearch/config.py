@@ -1,5 +1,5 @@
-from dataclasses import dataclass
-from typing import Tuple
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, Union
 
 
 # Spaces
@@ -18,13 +18,16 @@ class ConcentrationSpaceConfig:
 @dataclass
 class PhysicsHandlerConfig:
     space: PhysicsSpaceConfig
-    type: str
+    type: str = 'SalpPhysicsHandler'
 
 
 @dataclass
 class ConcentrationHandlerConfig:
     space: ConcentrationSpaceConfig
     type: str
+    diffusion_coefficient: float = 0.002
+    # extra keyword arguments for the handler type, e.g. CachedFicksConcentrationHandler's tolerance
+    params: dict = field(default_factory=dict)
 
 
 # Creatures
@@ -44,6 +47,8 @@ class SalpConfig:
 @dataclass
 class PinHandlerConfig:
     space: PhysicsSpaceConfig
+    # whether linked neighbours collide, pins hold them apart so they never need to
+    collide_bodies: bool = False
 
 
 @dataclass
@@ -51,6 +56,8 @@ class RotaryLimitHandlerConfig:
     space: PhysicsSpaceConfig
     min: float
     max: float
+    # whether linked neighbours collide, off so they generate no collision pairs
+    collide_bodies: bool = False
 
 
 @dataclass
@@ -58,6 +65,8 @@ class DampedSpringConfig:
     space: PhysicsSpaceConfig
     stiffness: float
     damping: float
+    # whether linked neighbours collide, off so they generate no collision pairs
+    collide_bodies: bool = False
 
 
 # Graphs
@@ -67,3 +76,72 @@ class LinearChainConfig:
     starting_point: tuple
     direction_vector: tuple
     distance: int
+
+
+@dataclass
+class RingChainConfig:
+    num_creatures: int
+    starting_point: tuple
+    direction_vector: tuple
+    distance: int
+
+
+@dataclass
+class BranchedChainConfig:
+    num_branches: int
+    branch_length: int
+    starting_point: tuple
+    direction_vector: tuple
+    distance: int
+
+
+@dataclass
+class GridLatticeConfig:
+    rows: int
+    columns: int
+    starting_point: tuple
+    direction_vector: tuple
+    distance: int
+
+
+@dataclass
+class RandomGraphConfig:
+    num_creatures: int
+    starting_point: tuple
+    direction_vector: tuple
+    distance: int
+    # None links pairs up to 1.5 * distance apart
+    link_distance: Optional[float] = None
+    link_probability: float = 0.5
+    seed: int = 0
+
+
+# Simulation
+@dataclass
+class SimulationConfig:
+    fps: int
+    max_time: float
+    # None draws fresh entropy, the seed actually used is available as Simulation.seed
+    seed: Optional[int] = None
+    # copies of the creature graph, each shifted by chain_offset from the previous one
+    num_chains: int = 1
+    chain_offset: tuple = (0, 40)
+    self_collision: bool = True
+    # shapes in the space before the broad phase switches to a spatial hash, None to never switch
+    spatial_hash_threshold: Optional[int] = 1024
+    # pymunk steps per frame, each of 1 / (fps * physics_substeps) seconds
+    physics_substeps: int = 1
+    # jet decisions per simulated second, a divisor of fps. None decides every frame
+    decision_rate: Optional[float] = None
+    # decision rate thrust was tuned at, impulses are scaled by impulse_reference_rate / decision_rate so the
+    # mean thrust per second does not depend on the decision rate. None applies thrust unscaled
+    impulse_reference_rate: Optional[float] = None
+
+
+@dataclass
+class RunConfig:
+    """Everything needed to build one independent Simulation"""
+    salp: SalpConfig
+    creature_graph: Union[LinearChainConfig, RingChainConfig, BranchedChainConfig, GridLatticeConfig, RandomGraphConfig]
+    link_handler: Union[PinHandlerConfig, RotaryLimitHandlerConfig, DampedSpringConfig]
+    simulation: SimulationConfig
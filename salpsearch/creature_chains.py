@@ -1,11 +1,16 @@
 from abc import ABC, abstractmethod
-from copy import deepcopy
 from typing import List
-import math
+
+import numpy as np
+import pymunk
+from pymunk import Vec2d
 
 from graphs import CreatureGraph
 from creatures import Creature
+from factories.creature_factory import SalpFactory
 from handlers import LinkHandler
+from profiling import Profiler
+from swarms import SalpSwarm
 
 
 class CreatureChain(ABC):
@@ -14,7 +19,9 @@ class CreatureChain(ABC):
         self.graph = creature_graph
         self.link_handler = link_handler
         self.creature_list: List[Creature] = self.create_creature_list()
-        pass
+        self.edges: List[tuple] = []
+        # set by Simulation.enable_profiling
+        self.profiler: Profiler = None
 
     @abstractmethod
     def create_creature_list(self) -> List[Creature]:
@@ -35,43 +42,116 @@ class CreatureChain(ABC):
         """Returns physics position of center of chain"""
         raise NotImplementedError
 
+    def seed(self, seed_sequence: np.random.SeedSequence):
+        """Gives the chain its own random streams spawned from seed_sequence"""
+        pass
+
+    def idle(self):
+        """Called instead of run_chain on frames without a decision"""
+        pass
+
+    def set_impulse_scale(self, scale: float):
+        """Multiplies every impulse the creatures apply from now on"""
+        pass
+
+    def set_collision_group(self, group: int):
+        """Shapes in the same non-zero group never collide with each other, 0 removes the group"""
+        shape_filter = pymunk.ShapeFilter(group=group)
+        for creature in self.creature_list:
+            for shape in creature.body.shapes:
+                shape.filter = shape_filter
+
+    def get_positions(self, out: np.ndarray = None) -> np.ndarray:
+        """(N, 2) array of physics positions, indexed like creature_list. Written into out if given"""
+        positions = np.array([creature.body.position for creature in self.creature_list], dtype=np.float64)
+        if out is None:
+            return positions
+        out[:] = positions
+        return out
+
+    def get_angles(self, out: np.ndarray = None) -> np.ndarray:
+        angles = np.array([creature.body.angle for creature in self.creature_list], dtype=np.float64)
+        if out is None:
+            return angles
+        out[:] = angles
+        return out
+
+    def get_voltages(self, out: np.ndarray = None) -> np.ndarray:
+        """Action potentials, NaN for creatures that have none"""
+        voltages = np.full(len(self.creature_list), np.nan)
+        if out is None:
+            return voltages
+        out[:] = voltages
+        return out
+
 
 class SalpChain(CreatureChain):
     def __init__(self, creature: Creature,
                  creature_graph: CreatureGraph,
                  link_handler: LinkHandler):
-        super().__init__()
-        self.creature = creature
-        self.graph = creature_graph
-        self.link_handler = link_handler
-        self.creature_list = self.create_creature_list()
+        self.swarm: SalpSwarm = SalpSwarm(creature_graph.num_creatures)
+        super().__init__(creature, creature_graph, link_handler)
         self.make_chain()
 
     def create_creature_list(self) -> List[Creature]:
-        creature_list = []
-        for i in range(self.graph.num_creatures):
-            pos = self.graph.positions[i]
-            temp_creature = deepcopy(self.creature)
-            temp_creature.pos = pos
-            angle = self.graph.direction_vector.angle
-            temp_creature.body.angle = angle
-            creature_list.append(temp_creature)
-        return creature_list
+        # the prototype only supplies parameters and shared handlers, its own body must not take part in physics
+        self.creature.physics_handler.remove_body(self.creature.body)
+        return SalpFactory().spawn_like(self.creature, self.graph.positions, swarm=self.swarm,
+                                        angle=self.graph.direction_vector.angle)
 
     def make_chain(self):
-        graph = self.graph.graph
-        for key in graph:
-            for val in graph[key]:
-                self.link_handler.add_link(self.creature_list[key].body, self.creature_list[val].body)
+        edges = self.graph.edges
+        bodies = [creature.body for creature in self.creature_list]
+        self.link_handler.add_links([(bodies[key], bodies[val]) for key, val in edges.tolist()])
+        self.edges = list(map(tuple, edges.tolist()))
+
+    def seed(self, seed_sequence: np.random.SeedSequence):
+        self.swarm.seed(seed_sequence)
+
+    def idle(self):
+        # nobody fires between decisions
+        self.swarm.fired[:] = False
+
+    def set_impulse_scale(self, scale: float):
+        self.swarm.impulse_scale = scale
+
+    def get_positions(self, out: np.ndarray = None) -> np.ndarray:
+        return self.swarm.get_positions(out)
+
+    def get_angles(self, out: np.ndarray = None) -> np.ndarray:
+        return self.swarm.get_angles(out)
+
+    def get_voltages(self, out: np.ndarray = None) -> np.ndarray:
+        if out is None:
+            return self.swarm.voltage.copy()
+        out[:] = self.swarm.voltage
+        return out
 
     def run_chain(self):
-        for creature in self.creature_list:
-            creature.jet_decision()
+        # one vectorized concentration query and one fused decision kernel for the whole chain
+        if self.profiler is not None:
+            self._profiled_run_chain()
+            return
+        concentrations = self.creature.concentration_handler.get_conc_many(self.get_positions(self.swarm.positions))
+        self.swarm.jet_decision(concentrations)
+
+    def _profiled_run_chain(self):
+        profiler = self.profiler
+        start = profiler.start()
+        positions = self.get_positions(self.swarm.positions)
+        profiler.stop('positions', start)
+        start = profiler.start()
+        concentrations = self.creature.concentration_handler.get_conc_many(positions)
+        profiler.stop('concentration', start)
+        start = profiler.start()
+        self.swarm.jet_decision(concentrations)
+        profiler.stop('jet_decision', start)
+        profiler.count('impulses', int(np.count_nonzero(self.swarm.fired)))
 
     def get_center(self):
-        if self.graph.num_creatures % 2 == 1:
-            center_ndx = int(math.floor(self.graph.num_creatures / 2))
-            return self.creature_list[center_ndx].pos
-        else:
-            center_ndx = int(self.graph.num_creatures / 2)
-            return (self.creature_list[center_ndx].pos + self.creature_list[center_ndx - 1].pos) / 2.0
+        center_indices = self.graph.center_indices
+        if len(center_indices) == 1:
+            return self.creature_list[center_indices[0]].pos
+        if len(center_indices) == 2:
+            return (self.creature_list[center_indices[1]].pos + self.creature_list[center_indices[0]].pos) / 2.0
+        return Vec2d(*self.get_positions()[center_indices].mean(axis=0))
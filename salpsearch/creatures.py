@@ -7,6 +7,7 @@ import pymunk
 from pymunk.vec2d import Vec2d
 
 from handlers import CreaturePhysicsHandler, ConcentrationHandler
+from swarms import SalpSwarm
 
 
 # space = pymunk.Space()
@@ -21,14 +22,14 @@ class Creature(ABC):
         - be aware of their position
         - propel self within simulation
     """
+    __slots__ = ('physics_handler', 'concentration_handler', 'body')
+
     def __init__(self, pos: Tuple[float, float], physics_handler: CreaturePhysicsHandler,
                  concentration_handler: ConcentrationHandler,
-                 **kwargs: Dict[str: any]):
+                 **kwargs: Dict[str, any]):
         self.physics_handler = physics_handler
         self.concentration_handler = concentration_handler
-        self.body: pymunk.Body = pymunk.Body()
-        self.pos: pymunk.vec2d = Vec2d(*pos)
-        pass
+        self.body: pymunk.Body = None
 
     @property
     @abstractmethod
@@ -38,7 +39,7 @@ class Creature(ABC):
     @pos.setter
     @abstractmethod
     def pos(self, pos: Tuple[float, float]):
-        self.pos = Vec2d(*pos)
+        self.body.position = Vec2d(*pos)
 
     @abstractmethod
     def get_conc(self):
@@ -74,16 +75,20 @@ class Salp(Creature):
             Amount to increase AP voltage given zero concentration at salp's location (decreases as concentration rises)
     """
 
+    __slots__ = ('radius', 'swarm', 'index')
+
     def __init__(self, pos: Tuple[float, float],
                  physics_handler: CreaturePhysicsHandler, concentration_handler: ConcentrationHandler,
                  **kwargs):
         super().__init__(pos, physics_handler, concentration_handler, **kwargs)
-        self.physics_handler = physics_handler
-        self.concentration_handler = concentration_handler
-        self.pos: Vec2d = Vec2d(*pos)
         self.radius: int = kwargs['radius']
-        self.body = self.physics_handler.create_body(self.radius, self.pos)
+        self.body = self.physics_handler.create_body(self.radius, Vec2d(*pos))
         self.body.angle = radians(kwargs['angle'])
+
+        # state lives in a swarm of one until the salp is attached to a chain's swarm
+        self.swarm = SalpSwarm(1)
+        self.index = 0
+        self.swarm.bodies[0] = self.body
         self.thrust: int = kwargs['thrust']
 
         # action potential properties
@@ -91,7 +96,29 @@ class Salp(Creature):
         self.action_potential_step: float = kwargs['action_potential_step']
         self.voltage = self.action_potential_baseline
 
-        self.physics_handler.add_body(self.body)
+    @classmethod
+    def from_body(cls, body: pymunk.Body, physics_handler: CreaturePhysicsHandler,
+                  concentration_handler: ConcentrationHandler, radius: float, swarm: SalpSwarm, index: int) -> 'Salp':
+        """Salp around an existing body whose state already sits in slot index of swarm, see SalpFactory.spawn"""
+        salp = cls.__new__(cls)
+        salp.physics_handler = physics_handler
+        salp.concentration_handler = concentration_handler
+        salp.body = body
+        salp.radius = radius
+        salp.swarm = swarm
+        salp.index = index
+        swarm.bodies[index] = body
+        return salp
+
+    def attach(self, swarm: SalpSwarm, index: int):
+        """Moves this salp's state into slot index of swarm, after which the salp is a view over it"""
+        swarm.voltage[index] = self.voltage
+        swarm.action_potential_baseline[index] = self.action_potential_baseline
+        swarm.action_potential_step[index] = self.action_potential_step
+        swarm.thrust[index] = self.thrust
+        swarm.bodies[index] = self.body
+        self.swarm = swarm
+        self.index = index
 
     @property
     def pos(self):
@@ -99,30 +126,65 @@ class Salp(Creature):
 
     @pos.setter
     def pos(self, pos: Tuple[float, float]):
-        self.pos = Vec2d(*pos)
+        self.body.position = Vec2d(*pos)
+
+    @property
+    def voltage(self) -> float:
+        return float(self.swarm.voltage[self.index])
+
+    @voltage.setter
+    def voltage(self, voltage: float):
+        self.swarm.voltage[self.index] = voltage
+
+    @property
+    def thrust(self) -> float:
+        return float(self.swarm.thrust[self.index])
+
+    @thrust.setter
+    def thrust(self, thrust: float):
+        self.swarm.thrust[self.index] = thrust
+
+    @property
+    def action_potential_baseline(self) -> float:
+        return float(self.swarm.action_potential_baseline[self.index])
+
+    @action_potential_baseline.setter
+    def action_potential_baseline(self, baseline: float):
+        self.swarm.action_potential_baseline[self.index] = baseline
+
+    @property
+    def action_potential_step(self) -> float:
+        return float(self.swarm.action_potential_step[self.index])
+
+    @action_potential_step.setter
+    def action_potential_step(self, step: float):
+        self.swarm.action_potential_step[self.index] = step
 
     def get_conc(self) -> float:
         return self.concentration_handler.get_conc(self.pos)
 
     # TODO unit test
     def jet_propel(self, thrustVec: Vec2d) -> bool:
-        seed = np.random.rand()
+        seed = self.swarm.rng.random()
         if seed < self.voltage:
-            self.body.apply_impulse_at_local_point(thrustVec * self.thrust, (0, 0))
+            self.body.apply_impulse_at_local_point(thrustVec * (self.thrust * self.swarm.impulse_scale), (0, 0))
             return True
         else:
             return False
 
     # TODO unit test
-    def threshold_update(self):
-        salpConc = self.get_conc() / 255
+    def threshold_update(self, conc: float = None):
+        """conc may be passed in when it was already queried in bulk by the chain"""
+        if conc is None:
+            conc = self.get_conc()
+        salpConc = conc / 255
         ap_step = self.action_potential_step * (1 - np.tanh(salpConc))
         return ap_step
 
     # TODO unit test
-    def jet_decision(self):
+    def jet_decision(self, conc: float = None):
         thrust_vec = Vec2d(0, 1).rotated(self.body.angle)
         if self.jet_propel(thrust_vec):
             self.voltage = self.action_potential_baseline
         elif not self.jet_propel(thrust_vec):
-            self.voltage += self.threshold_update()
+            self.voltage += self.threshold_update(conc)
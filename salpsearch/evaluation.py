@@ -0,0 +1,248 @@
+from dataclasses import dataclass, replace
+import math
+import os
+import signal
+from typing import Callable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from config import RunConfig
+from factories.simulation_factory import SimulationFactory
+from helpers import get_pool_context
+from result_cache import ResultCache, canonical_hash
+from simulation import Simulation, Checkpoint
+from termination import TerminationCondition
+
+
+class EvaluationTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise EvaluationTimeout
+
+
+@dataclass
+class EvaluationTask:
+    """One simulation to run. max_time overrides config.simulation.max_time, and a checkpoint resumes a
+    previous run of the same config instead of building a new simulation"""
+    config: RunConfig
+    max_time: float = None
+    checkpoint: Checkpoint = None
+    return_checkpoint: bool = False
+
+
+@dataclass
+class EvaluationResult:
+    fitness: float
+    # simulated time reached, and whether a termination condition (or the timeout) ended the run
+    t: float
+    terminated: bool
+    checkpoint: Checkpoint = None
+
+
+def evaluate_config(config: RunConfig, termination_conditions: Sequence[TerminationCondition] = ()) -> float:
+    """Builds and runs one headless simulation, returns its fitness"""
+    simulation = SimulationFactory().make_simulation(config)
+    simulation.run(termination_conditions=termination_conditions)
+    return simulation.get_fitness()
+
+
+def run_task(task: EvaluationTask, termination_conditions: Sequence[TerminationCondition] = ()) -> EvaluationResult:
+    if task.checkpoint is None:
+        simulation = SimulationFactory().make_simulation(task.config)
+    else:
+        simulation = Simulation.restore(task.checkpoint)
+    if task.max_time is not None:
+        simulation.max_time = task.max_time
+
+    terminated_by = simulation.run(termination_conditions=termination_conditions)
+    checkpoint = simulation.checkpoint() if task.return_checkpoint else None
+    return EvaluationResult(simulation.get_fitness(), simulation.t, terminated_by is not None, checkpoint)
+
+
+def _run_task(args):
+    task, timeout, failed_fitness, termination_conditions, cache, key = args
+    # SIGALRM interrupts the simulation loop inside the worker, so a slow task never blocks its pool slot
+    use_alarm = timeout is not None and hasattr(signal, 'setitimer')
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result = run_task(task, termination_conditions)
+    except EvaluationTimeout:
+        return EvaluationResult(failed_fitness, math.nan, True)
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+    # written by the worker as soon as the run finishes, so an interrupted sweep keeps what it computed.
+    # Timeouts depend on the machine, not the config, and are not cached
+    if key is not None:
+        cache.put(key, task.config, result.fitness, result.t, result.terminated)
+    return result
+
+
+class EvaluationEngine:
+    """Evaluates the fitness of a population of RunConfigs on a process pool.
+    Each task builds its own Simulation in the worker, so runs never share a pymunk.Space.
+    Workers are started by a fork server (see helpers.get_pool_context), which imports the main module, so
+    scripts using an engine with workers must guard their entry point with if __name__ == '__main__':
+
+    kwargs:
+        num_workers: int
+            number of worker processes, defaults to os.cpu_count(). 0 evaluates in the calling process
+        chunksize: int
+            number of configs sent to a worker at a time
+        timeout: float
+            wall time limit in seconds for a single simulation, None for no limit
+        failed_fitness: float
+            fitness reported for simulations that time out (lower fitness is better)
+        seed: int
+            configs without a simulation seed get one derived from this seed and the config itself, so
+            evaluations are reproducible and a config seen again in a later generation hits the cache.
+            None draws fresh entropy
+        termination_conditions: list
+            termination.TerminationConditions checked in every run to stop it early
+        cache: ResultCache
+            if given, tasks that start from scratch and do not return a checkpoint are looked up in it
+            before running and stored in it afterwards. Only configs with a fixed seed hit across
+            sessions, so give the engine a seed to resume a sweep
+    """
+
+    def __init__(self, num_workers: int = None, chunksize: int = 1, timeout: float = None,
+                 failed_fitness: float = math.inf, seed: int = None,
+                 termination_conditions: Sequence[TerminationCondition] = (), cache: ResultCache = None):
+        self.num_workers = os.cpu_count() if num_workers is None else num_workers
+        self.chunksize = chunksize
+        self.timeout = timeout
+        self.failed_fitness = failed_fitness
+        self.seed: int = np.random.SeedSequence().entropy if seed is None else seed
+        self.termination_conditions = list(termination_conditions)
+        self.cache = cache
+
+    def resolve_seeds(self, population: Sequence[RunConfig]) -> List[RunConfig]:
+        """Copies of population where every config has an explicit simulation seed. The seed depends only on
+        the engine's seed and the config, not on its position, so equal configs get equal seeds"""
+        resolved = []
+        for config in population:
+            if config.simulation.seed is None:
+                seed_sequence = np.random.SeedSequence([self.seed, canonical_hash(config)])
+                seed = int(seed_sequence.generate_state(1, np.uint64)[0])
+                config = replace(config, simulation=replace(config.simulation, seed=seed))
+            resolved.append(config)
+        return resolved
+
+    def cache_key(self, task: EvaluationTask) -> Optional[str]:
+        """None for tasks whose result is not cached"""
+        if self.cache is None or task.checkpoint is not None or task.return_checkpoint:
+            return None
+        return self.cache.key(task.config, task.max_time, self.termination_conditions)
+
+    def run_tasks(self, tasks: Sequence[EvaluationTask],
+                  progress: Callable[[int, int], None] = None) -> List[EvaluationResult]:
+        """Results in the same order as tasks. Cached results are returned without running anything, and
+        tasks with the same cache key run once. progress is called with (finished, total) tasks whenever
+        a run finishes"""
+        keys = [self.cache_key(task) for task in tasks]
+        cached = {} if self.cache is None else self.cache.get_many(key for key in keys if key is not None)
+        results: List[Optional[EvaluationResult]] = [None] * len(tasks)
+        pending = {}
+        for i, (task, key) in enumerate(zip(tasks, keys)):
+            if key in cached:
+                results[i] = EvaluationResult(*cached[key])
+            elif key is None:
+                pending[i] = [i]
+            elif key in pending:
+                pending[key].append(i)
+            else:
+                pending[key] = [i]
+
+        args = [(tasks[indices[0]], self.timeout, self.failed_fitness, self.termination_conditions, self.cache,
+                 keys[indices[0]]) for indices in pending.values()]
+        finished = len(tasks) - sum(len(indices) for indices in pending.values())
+        if progress is not None:
+            progress(finished, len(tasks))
+        for indices, result in zip(pending.values(), self._compute(args)):
+            for i in indices:
+                results[i] = result
+            finished += len(indices)
+            if progress is not None:
+                progress(finished, len(tasks))
+        return results
+
+    def _compute(self, args: list) -> Iterator[EvaluationResult]:
+        """Runs _run_task over args, yielding results in order as they become available"""
+        if self.num_workers == 0:
+            yield from map(_run_task, args)
+        elif args:
+            with get_pool_context().Pool(min(self.num_workers, len(args))) as pool:
+                yield from pool.imap(_run_task, args, chunksize=self.chunksize)
+                # leaving the with block terminates the workers, joining them first lets them release their locks
+                pool.close()
+                pool.join()
+
+    def evaluate(self, population: Sequence[RunConfig]) -> List[float]:
+        """Returns fitnesses in the same order as population. Pass the population through resolve_seeds
+        first to know the seed each run used"""
+        results = self.run_tasks([EvaluationTask(config) for config in self.resolve_seeds(population)])
+        return [result.fitness for result in results]
+
+
+class SuccessiveHalvingScheduler:
+    """Evaluates a population by successive halving: every candidate is simulated for min_time, the
+    best 1 / eta of them are extended by a factor of eta in simulated time, and so on up to max_time.
+    Survivors resume from a checkpoint of their previous rung, so no simulated time is repeated, and runs
+    ended early by the engine's termination conditions are not extended.
+    Dropped candidates keep the fitness of the last rung they reached.
+
+    kwargs:
+        engine: EvaluationEngine
+            runs each rung in parallel
+        min_time: float
+            simulated time of the first rung
+        max_time: float
+            simulated time reached by the final survivors
+        eta: float
+            factor by which the population shrinks and the horizon grows per rung
+    """
+
+    def __init__(self, engine: EvaluationEngine, min_time: float = 1, max_time: float = 10, eta: float = 3):
+        self.engine = engine
+        self.min_time = min_time
+        self.max_time = max_time
+        self.eta = eta
+        # total simulated seconds spent by the last evaluate call
+        self.simulated_time = 0.
+
+    def evaluate(self, population: Sequence[RunConfig]) -> List[float]:
+        configs = self.engine.resolve_seeds(population)
+        fitnesses = [math.inf] * len(configs)
+        checkpoints: List[Checkpoint] = [None] * len(configs)
+        alive = list(range(len(configs)))
+        horizon = min(self.min_time, self.max_time)
+        self.simulated_time = 0.
+
+        while alive:
+            final_rung = horizon >= self.max_time
+            tasks = [EvaluationTask(configs[i], max_time=horizon, checkpoint=checkpoints[i],
+                                    return_checkpoint=not final_rung) for i in alive]
+            results = self.engine.run_tasks(tasks)
+
+            survivors = []
+            for i, task, result in zip(alive, tasks, results):
+                fitnesses[i] = result.fitness
+                checkpoints[i] = result.checkpoint
+                if not math.isnan(result.t):
+                    self.simulated_time += result.t - (0. if task.checkpoint is None else task.checkpoint.t)
+                if not result.terminated:
+                    survivors.append(i)
+            if final_rung:
+                break
+
+            survivors.sort(key=lambda i: fitnesses[i])
+            alive = survivors[:int(math.ceil(len(survivors) / self.eta))]
+            checkpoints = [checkpoint if i in alive else None for i, checkpoint in enumerate(checkpoints)]
+            horizon = min(horizon * self.eta, self.max_time)
+
+        return fitnesses
@@ -0,0 +1,143 @@
+import os
+import subprocess
+from collections import deque
+
+import numpy as np
+import pygame
+
+from handlers import ConcentrationSpace, FicksConcentrationHandler
+from helpers import ConcentrationRasterizer, get_pool_context
+from recording import TrajectoryReader
+from rendering import PygameHandler
+from simulation import SimulationSnapshot
+
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.webm', '.gif')
+# default cap on frames per chunk, about 60 MB of raw 800x800 RGB
+MAX_CHUNK_FRAMES = 32
+# handlers whose field is a function of the recorded origin and time alone, so it can be redrawn
+REPRODUCIBLE_HANDLERS = ('FicksConcentrationHandler', 'CachedFicksConcentrationHandler')
+
+
+def _render_frames(task):
+    """Renders recorded steps in range(start, stop, stride) headlessly. The concentration field is drawn
+    for handlers in REPRODUCIBLE_HANDLERS and left out for any other.
+    Saves them as PNGs into image_dir, or returns the raw RGB bytes of every frame when image_dir is None"""
+    path, start, stop, stride, image_dir, downsample = task
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    reader = TrajectoryReader(path)
+    metadata = reader.metadata
+
+    render_handler = PygameHandler(pygame.Surface((800, 800)))
+    concentration_handler = None
+    handler_metadata = metadata.get('concentration_handler') or {}
+    if handler_metadata.get('type') in REPRODUCIBLE_HANDLERS:
+        concentration_handler = FicksConcentrationHandler(ConcentrationSpace(metadata['concentration_origin']),
+                                                          D=handler_metadata['D'])
+        rasterizer = ConcentrationRasterizer((render_handler.disp, render_handler.disp), downsample)
+
+    steps = reader[start:stop:stride]
+    edges = [tuple(edge) for edge in metadata['edges']]
+    frames = []
+    for i in range(len(steps['frames'])):
+        t = float(steps['frames'][i] * reader.dt)
+        snapshot = SimulationSnapshot(frame=int(steps['frames'][i]), t=t, positions=steps['positions'][i],
+                                      radii=metadata['radii'], edges=edges,
+                                      concentration_origin=tuple(metadata['concentration_origin']),
+                                      concentration_t=t)
+        background = None
+        if concentration_handler is not None:
+            background = concentration_handler.render(rasterizer, snapshot.concentration_origin, t)
+        render_handler.draw_snapshot(snapshot, background)
+
+        if image_dir is None:
+            frames.append(pygame.image.tostring(render_handler.screen, 'RGB'))
+        else:
+            pygame.image.save(render_handler.screen, os.path.join(image_dir, 'frame_%08d.png' % (start + i * stride)))
+    return frames
+
+
+def export_video(path: str, output: str, num_workers: int = None, fps: float = None, stride: int = 1,
+                 chunk_frames: int = None, downsample: int = 2, ffmpeg: str = 'ffmpeg', max_in_flight: int = None):
+    """Renders a recording made by recording.TrajectoryRecorder without a display.
+    The frame range is split into chunks rendered on a process pool. If output has a video extension the
+    frames are streamed in order to ffmpeg, otherwise output is a directory that receives a PNG sequence.
+    Like EvaluationEngine, call it from under if __name__ == '__main__': in scripts.
+    At most max_in_flight chunks are queued or held at a time, so memory stays bounded however much
+    faster the workers render than ffmpeg encodes.
+
+    kwargs:
+        num_workers: int
+            worker processes, defaults to os.cpu_count()
+        fps: float
+            output frame rate, defaults to real time given the recording's dt and stride
+        stride: int
+            render every stride-th recorded step
+        chunk_frames: int
+            recorded steps per pool task, defaults to an even split into four tasks per worker but at most
+            MAX_CHUNK_FRAMES rendered frames
+        max_in_flight: int
+            chunks submitted to the pool and not yet written, defaults to 2 * num_workers
+        downsample: int
+            background resolution divisor, see helpers.ConcentrationRasterizer
+    """
+    reader = TrajectoryReader(path)
+    num_workers = num_workers or os.cpu_count()
+    num_steps = len(reader)
+    if chunk_frames is None:
+        chunk_frames = min(int(np.ceil(num_steps / (num_workers * 4) / stride)), MAX_CHUNK_FRAMES) * stride
+        chunk_frames = max(stride, chunk_frames)
+    max_in_flight = max_in_flight or 2 * num_workers
+    fps = fps or 1 / (reader.dt * stride)
+
+    image_dir = None
+    if not output.lower().endswith(VIDEO_EXTENSIONS):
+        image_dir = output
+        os.makedirs(image_dir, exist_ok=True)
+    tasks = [(path, start, min(start + chunk_frames, num_steps), stride, image_dir, downsample)
+             for start in range(0, num_steps, chunk_frames)]
+
+    encoder = None
+    if image_dir is None:
+        encoder = subprocess.Popen([ffmpeg, '-y', '-loglevel', 'error',
+                                    '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', '800x800', '-r', str(fps),
+                                    '-i', '-', '-pix_fmt', 'yuv420p', output], stdin=subprocess.PIPE)
+    try:
+        with get_pool_context().Pool(num_workers) as pool:
+            # imap would collect every finished chunk in the parent, a window keeps at most max_in_flight
+            in_flight = deque()
+            remaining = iter(tasks)
+            for task in remaining:
+                in_flight.append(pool.apply_async(_render_frames, (task,)))
+                if len(in_flight) == max_in_flight:
+                    break
+            while in_flight:
+                frames = in_flight.popleft().get()
+                next_task = next(remaining, None)
+                if next_task is not None:
+                    in_flight.append(pool.apply_async(_render_frames, (next_task,)))
+                if encoder is not None:
+                    for frame in frames:
+                        encoder.stdin.write(frame)
+                del frames
+            # leaving the with block terminates the workers, joining them first lets them release their locks
+            pool.close()
+            pool.join()
+    finally:
+        if encoder is not None:
+            encoder.stdin.close()
+            encoder.wait()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Render a recorded trajectory to a video or PNG sequence')
+    parser.add_argument('recording')
+    parser.add_argument('output', help='video file (%s) or image directory' % ', '.join(VIDEO_EXTENSIONS))
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--fps', type=float, default=None)
+    parser.add_argument('--stride', type=int, default=1)
+    parser.add_argument('--downsample', type=int, default=2)
+    args = parser.parse_args()
+    export_video(args.recording, args.output, num_workers=args.workers, fps=args.fps, stride=args.stride,
+                 downsample=args.downsample)
@@ -1,21 +1,85 @@
-from abc import ABC
-import hydra
+from abc import ABC, abstractmethod
+from math import radians
+from typing import List
 
-from salpsearch.creatures import Creature
+import numpy as np
+
+from config import SalpConfig
+from creatures import Creature, Salp
+from handlers import CreaturePhysicsHandler, ConcentrationHandler
+from swarms import SalpSwarm
 
 
 class CreatureFactory(ABC):
+    """Builds creatures that share one physics handler and one concentration handler"""
     def __init__(self):
         pass
 
-    def make_creature(self) -> Creature:
-        pass
+    @abstractmethod
+    def make_creature(self, config, physics_handler: CreaturePhysicsHandler,
+                      concentration_handler: ConcentrationHandler) -> Creature:
+        raise NotImplementedError
+
+    @abstractmethod
+    def spawn(self, config, positions: np.ndarray, physics_handler: CreaturePhysicsHandler,
+              concentration_handler: ConcentrationHandler, **kwargs) -> List[Creature]:
+        """One creature per row of the (N, 2) positions array, with their bodies added to the space in bulk"""
+        raise NotImplementedError
 
 
 class SalpFactory(CreatureFactory):
     def __init__(self):
         super().__init__()
 
-    @hydra.main(config_path='conf/salp', config_name='default')
-    def make_creature(self):
-        pass
+    def make_creature(self, config: SalpConfig, physics_handler: CreaturePhysicsHandler,
+                      concentration_handler: ConcentrationHandler) -> Salp:
+        return Salp(config.pos, physics_handler, concentration_handler,
+                    radius=config.radius,
+                    angle=config.angle,
+                    thrust=config.thrust,
+                    action_potential_baseline=config.action_potential_baseline,
+                    action_potential_step=config.action_potential_step)
+
+    def spawn(self, config: SalpConfig, positions: np.ndarray, physics_handler: CreaturePhysicsHandler,
+              concentration_handler: ConcentrationHandler, swarm: SalpSwarm = None,
+              angle: float = None) -> List[Salp]:
+        """kwargs:
+            swarm: SalpSwarm
+                swarm holding the salps' state, one slot per position. A new one is created if None
+            angle: float
+                starting angle in radians, defaults to config.angle (in degrees)"""
+        return self.spawn_salps(positions, physics_handler, concentration_handler,
+                                radius=config.radius,
+                                angle=radians(config.angle) if angle is None else angle,
+                                thrust=config.thrust,
+                                action_potential_baseline=config.action_potential_baseline,
+                                action_potential_step=config.action_potential_step,
+                                swarm=swarm)
+
+    def spawn_like(self, prototype: Salp, positions: np.ndarray, swarm: SalpSwarm = None,
+                   angle: float = None) -> List[Salp]:
+        """Salps with the parameters and handlers of prototype. The prototype itself is left untouched"""
+        return self.spawn_salps(positions, prototype.physics_handler, prototype.concentration_handler,
+                                radius=prototype.radius,
+                                angle=prototype.body.angle if angle is None else angle,
+                                thrust=prototype.thrust,
+                                action_potential_baseline=prototype.action_potential_baseline,
+                                action_potential_step=prototype.action_potential_step,
+                                swarm=swarm)
+
+    @staticmethod
+    def spawn_salps(positions: np.ndarray, physics_handler: CreaturePhysicsHandler,
+                    concentration_handler: ConcentrationHandler, radius: float, angle: float, thrust: float,
+                    action_potential_baseline: float, action_potential_step: float,
+                    swarm: SalpSwarm = None) -> List[Salp]:
+        positions = np.asarray(positions, dtype=np.float64).reshape(-1, 2)
+        if swarm is None:
+            swarm = SalpSwarm(len(positions))
+        bodies = physics_handler.create_bodies(radius, positions, angle)
+
+        swarm.voltage[:] = action_potential_baseline
+        swarm.action_potential_baseline[:] = action_potential_baseline
+        swarm.action_potential_step[:] = action_potential_step
+        swarm.thrust[:] = thrust
+        return [Salp.from_body(body, physics_handler, concentration_handler, radius, swarm, index)
+                for index, body in enumerate(bodies)]
@@ -0,0 +1,70 @@
+from dataclasses import asdict, replace
+
+import pymunk
+
+from config import (RunConfig, PhysicsSpaceConfig, PinHandlerConfig, RotaryLimitHandlerConfig, DampedSpringConfig,
+                    LinearChainConfig, RingChainConfig, BranchedChainConfig, GridLatticeConfig, RandomGraphConfig)
+from creature_chains import SalpChain
+from factories.creature_factory import SalpFactory
+from graphs import CreatureGraph, LinearChain, RingChain, BranchedChain, GridLattice, RandomGraph
+from handlers import ConcentrationSpace, LinkHandler, PinHandler, RotaryLimitHandler, DampedSpringHandler
+from registry import factory_method
+from simulation import Simulation
+
+
+class SimulationFactory:
+    """Builds a complete Simulation from a RunConfig.
+    Every simulation gets its own pymunk.Space and ConcentrationSpace, so any number of them can
+    run side by side (or in separate processes) without contaminating each other.
+    Physics and concentration handlers are looked up by their config's type name in the registry,
+    so plugins added with registry.register_function work from configs too."""
+
+    graphs = {LinearChainConfig: LinearChain,
+              RingChainConfig: RingChain,
+              BranchedChainConfig: BranchedChain,
+              GridLatticeConfig: GridLattice,
+              RandomGraphConfig: RandomGraph}
+
+    @staticmethod
+    def make_space(config: PhysicsSpaceConfig) -> pymunk.Space:
+        space = pymunk.Space()
+        space.damping = config.damping
+        return space
+
+    @staticmethod
+    def make_link_handler(config, space: pymunk.Space) -> LinkHandler:
+        if isinstance(config, PinHandlerConfig):
+            return PinHandler(space, collide_bodies=config.collide_bodies)
+        elif isinstance(config, RotaryLimitHandlerConfig):
+            return RotaryLimitHandler(space, min=config.min, max=config.max, collide_bodies=config.collide_bodies)
+        elif isinstance(config, DampedSpringConfig):
+            return DampedSpringHandler(space, stiffness=config.stiffness, damping=config.damping,
+                                       collide_bodies=config.collide_bodies)
+        raise ValueError("Unknown link handler config %s" % type(config).__name__)
+
+    def make_graph(self, config) -> CreatureGraph:
+        if type(config) not in self.graphs:
+            raise ValueError("Unknown creature graph config %s" % type(config).__name__)
+        return self.graphs[type(config)](**asdict(config))
+
+    def make_simulation(self, config: RunConfig) -> Simulation:
+        salp_config = config.salp
+        space = self.make_space(salp_config.physics_handler.space)
+        concentration_space = ConcentrationSpace(salp_config.concentration_handler.space.origin)
+
+        physics_handler = factory_method(salp_config.physics_handler.type)(space)
+        concentration_handler = factory_method(salp_config.concentration_handler.type)(
+            concentration_space, D=salp_config.concentration_handler.diffusion_coefficient,
+            **salp_config.concentration_handler.params)
+
+        salp = SalpFactory().make_creature(salp_config, physics_handler, concentration_handler)
+        link_handler = self.make_link_handler(config.link_handler, space)
+        x, y = config.creature_graph.starting_point
+        dx, dy = config.simulation.chain_offset
+        graphs = [self.make_graph(replace(config.creature_graph, starting_point=(x + i * dx, y + i * dy)))
+                  for i in range(config.simulation.num_chains)]
+        Simulation.configure_broad_phase(space, sum(graph.num_creatures for graph in graphs), salp_config.radius,
+                                         config.simulation.spatial_hash_threshold)
+        creature_chains = [SalpChain(salp, graph, link_handler) for graph in graphs]
+
+        return Simulation(creature_chains, **asdict(config.simulation))
@@ -1,32 +1,102 @@
 from abc import ABC, abstractmethod
+from functools import cached_property
 from pymunk.vec2d import Vec2d
 from typing import List, Dict
 
+import numpy as np
+
 
 class CreatureGraph(ABC):
+    """Topology and starting layout of a group of creatures.
+    Subclasses build their edges and positions as arrays once, everything else is derived and cached.
+
+    properties:
+        edges: np.ndarray
+            (E, 2) int64 array of undirected links, each stored once with the lower index first
+        positions: np.ndarray
+            (N, 2) float64 array of physics positions, row i is creature i
+        indptr, indices: np.ndarray
+            CSR adjacency, the neighbours of creature i are indices[indptr[i]:indptr[i + 1]]
+        graph: dict
+            representation of salp connections. deduplicated."""
+
     def __init__(self, **kwargs):
         self.num_creatures: int = 0
         self.direction_vector: Vec2d = Vec2d(0, 0)
 
     # TODO unit test
     @staticmethod
-    def deduplicate_graph(graph: dict) -> Dict[int: int]:
+    def deduplicate_graph(graph: dict) -> Dict[int, List[int]]:
         deduplicated_graph = {}
         for key in graph:
             deduplicated_graph[key] = [val for val in graph[key] if val not in deduplicated_graph]
 
         return deduplicated_graph
 
-    @property
     @abstractmethod
-    def graph(self) -> List:
+    def build_edges(self) -> np.ndarray:
+        """(E, 2) array of links"""
         raise NotImplementedError
 
-    @property
     @abstractmethod
-    def positions(self) -> List[tuple]:
+    def build_positions(self) -> np.ndarray:
+        """(N, 2) array of physics positions"""
         raise NotImplementedError
 
+    @cached_property
+    def edges(self) -> np.ndarray:
+        edges = np.asarray(self.build_edges(), dtype=np.int64).reshape(-1, 2)
+        low = np.minimum(edges[:, 0], edges[:, 1])
+        high = np.maximum(edges[:, 0], edges[:, 1])
+        keep = low != high
+        # one int64 key per link makes deduplication a 1D sort
+        keys = np.sort(low[keep] * max(self.num_creatures, 1) + high[keep])
+        keys = keys[np.concatenate(([True], keys[1:] != keys[:-1]))] if len(keys) else keys
+        return np.stack(np.divmod(keys, max(self.num_creatures, 1)), axis=1)
+
+    @cached_property
+    def positions(self) -> np.ndarray:
+        return np.asarray(self.build_positions(), dtype=np.float64).reshape(self.num_creatures, 2)
+
+    @cached_property
+    def _csr(self):
+        edges = self.edges
+        sources = np.concatenate((edges[:, 0], edges[:, 1]))
+        targets = np.concatenate((edges[:, 1], edges[:, 0]))
+        order = np.argsort(sources, kind='stable')
+        indptr = np.zeros(self.num_creatures + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=self.num_creatures), out=indptr[1:])
+        return indptr, targets[order]
+
+    @property
+    def indptr(self) -> np.ndarray:
+        return self._csr[0]
+
+    @property
+    def indices(self) -> np.ndarray:
+        return self._csr[1]
+
+    def neighbours(self, index: int) -> np.ndarray:
+        indptr, indices = self._csr
+        return indices[indptr[index]:indptr[index + 1]]
+
+    @cached_property
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    @property
+    def graph(self) -> Dict[int, List[int]]:
+        """Every link listed once, under its lower index"""
+        graph = {key: [] for key in range(self.num_creatures)}
+        for key, val in self.edges.tolist():
+            graph[key].append(val)
+        return graph
+
+    @property
+    def center_indices(self) -> List[int]:
+        """Creatures whose mean position is the center of the group"""
+        return list(range(self.num_creatures))
+
 
 class LinearChain(CreatureGraph):
     """Creates a graph and list of positions corresponding to a linear chain
@@ -43,37 +113,208 @@ class LinearChain(CreatureGraph):
     properties:
         graph: dict
             representation of salp connections. deduplicated.
-        positions: List[tuple]
-            list of salp positions where index corresponds with index stored in graph"""
+        positions: np.ndarray
+            salp positions where index corresponds with index stored in graph"""
 
     def __init__(self, **kwargs):
         super().__init__()
         assert len(kwargs['starting_point']) == 2
         assert len(kwargs['direction_vector']) == 2
         self.num_creatures = kwargs['num_creatures']
-        self.starting_point = Vec2d(tuple(kwargs['starting_point']))
-        self.direction_vector = Vec2d(tuple(kwargs['direction_vector'])).normalized()
+        self.starting_point = Vec2d(*kwargs['starting_point'])
+        self.direction_vector = Vec2d(*kwargs['direction_vector']).normalized()
         self.distance = kwargs['distance']
 
-    # TODO unit test
+    def build_edges(self) -> np.ndarray:
+        creatures = np.arange(self.num_creatures - 1)
+        return np.stack((creatures, creatures + 1), axis=1)
+
+    def build_positions(self) -> np.ndarray:
+        """Salp positions along the chain"""
+        chain_length = self.num_creatures * self.distance
+        chain_vector = np.array(self.direction_vector.perpendicular_normal())  # rotates by +90 degrees
+        first_position = np.array(self.starting_point) - (chain_length * 0.5 * chain_vector)
+        return first_position + np.outer(np.arange(self.num_creatures) * self.distance, chain_vector)
+
     @property
-    def graph(self) -> dict:
-        graph = {0: [1]}
-        for creature_ndx in range(1, self.num_creatures - 1):
-            graph[creature_ndx] = [creature_ndx + 1, creature_ndx - 1]
-        graph[self.num_creatures] = self.num_creatures - 1
+    def center_indices(self) -> List[int]:
+        middle = self.num_creatures // 2
+        return [middle] if self.num_creatures % 2 == 1 else [middle - 1, middle]
 
-        return self.deduplicate_graph(graph)
 
-    # TODO unit test
+class RingChain(CreatureGraph):
+    """Closed chain laid out on a circle, every salp thrusting the same way
+    kwargs:
+        num_creatures: int
+            number of salps in the ring
+        starting_point: list
+            center of the ring
+        direction_vector: list
+            direction of thrust
+        distance: float
+            distance between neighbouring salps along the ring"""
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.num_creatures = kwargs['num_creatures']
+        self.starting_point = Vec2d(*kwargs['starting_point'])
+        self.direction_vector = Vec2d(*kwargs['direction_vector']).normalized()
+        self.distance = kwargs['distance']
+
+    def build_edges(self) -> np.ndarray:
+        creatures = np.arange(self.num_creatures)
+        return np.stack((creatures, (creatures + 1) % self.num_creatures), axis=1)
+
+    def build_positions(self) -> np.ndarray:
+        angles = 2 * np.pi * np.arange(self.num_creatures) / self.num_creatures
+        # chord length between neighbours equals distance
+        radius = self.distance / (2 * np.sin(np.pi / max(self.num_creatures, 2)))
+        return np.array(self.starting_point) + radius * np.stack((np.cos(angles), np.sin(angles)), axis=1)
+
+
+class BranchedChain(CreatureGraph):
+    """A hub salp with num_branches linear arms of branch_length salps radiating from it
+    kwargs:
+        num_branches: int
+            number of arms
+        branch_length: int
+            salps per arm, the hub not included
+        starting_point: list
+            position of the hub
+        direction_vector: list
+            direction of thrust
+        distance: float
+            distance between linked salps"""
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.num_branches = kwargs['num_branches']
+        self.branch_length = kwargs['branch_length']
+        if self.num_branches < 1 or self.branch_length < 1:
+            raise ValueError("BranchedChain needs at least one branch of length 1, got %s branches of length %s"
+                             % (self.num_branches, self.branch_length))
+        self.num_creatures = 1 + self.num_branches * self.branch_length
+        self.starting_point = Vec2d(*kwargs['starting_point'])
+        self.direction_vector = Vec2d(*kwargs['direction_vector']).normalized()
+        self.distance = kwargs['distance']
+
+    def build_edges(self) -> np.ndarray:
+        # creature 1 + b * branch_length + k is salp k of arm b, counted outward from the hub
+        arms = 1 + np.arange(self.num_branches * self.branch_length).reshape(self.num_branches, self.branch_length)
+        inner = np.concatenate((np.zeros((self.num_branches, 1), dtype=np.int64), arms[:, :-1]), axis=1)
+        return np.stack((inner.ravel(), arms.ravel()), axis=1)
+
+    def build_positions(self) -> np.ndarray:
+        angles = self.direction_vector.angle + 2 * np.pi * np.arange(self.num_branches) / self.num_branches
+        units = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+        steps = self.distance * np.arange(1, self.branch_length + 1)
+        arms = units[:, None, :] * steps[None, :, None]
+        return np.array(self.starting_point) + np.concatenate((np.zeros((1, 2)), arms.reshape(-1, 2)))
+
     @property
-    def positions(self) -> List[tuple]:
-        """List of salp positions"""
-        chain_length = self.num_creatures * self.distance
-        chain_vector = self.direction_vector.perpendicular_normal()  # rotates by +90 degrees
-        first_position = self.starting_point - (chain_length * 0.5 * chain_vector)
-        positions = []
-        for i in range(0, self.num_creatures):
-            positions.append(first_position + (i * self.distance * chain_vector))
+    def center_indices(self) -> List[int]:
+        return [0]
+
+
+class GridLattice(CreatureGraph):
+    """rows x columns salps, each linked to its four lattice neighbours
+    kwargs:
+        rows: int
+            salps along direction_vector
+        columns: int
+            salps across direction_vector
+        starting_point: list
+            center of the lattice
+        direction_vector: list
+            direction of thrust
+        distance: float
+            lattice spacing"""
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.rows = kwargs['rows']
+        self.columns = kwargs['columns']
+        self.num_creatures = self.rows * self.columns
+        self.starting_point = Vec2d(*kwargs['starting_point'])
+        self.direction_vector = Vec2d(*kwargs['direction_vector']).normalized()
+        self.distance = kwargs['distance']
+
+    def build_edges(self) -> np.ndarray:
+        index = np.arange(self.num_creatures).reshape(self.rows, self.columns)
+        across = np.stack((index[:, :-1].ravel(), index[:, 1:].ravel()), axis=1)
+        along = np.stack((index[:-1, :].ravel(), index[1:, :].ravel()), axis=1)
+        return np.concatenate((across, along))
+
+    def build_positions(self) -> np.ndarray:
+        along = np.array(self.direction_vector)
+        across = np.array(self.direction_vector.perpendicular_normal())
+        row = (np.arange(self.rows) - (self.rows - 1) / 2) * self.distance
+        column = (np.arange(self.columns) - (self.columns - 1) / 2) * self.distance
+        offsets = row[:, None, None] * along + column[None, :, None] * across
+        return np.array(self.starting_point) + offsets.reshape(-1, 2)
+
+
+class RandomGraph(CreatureGraph):
+    """Random geometric graph: salps on a jittered square lattice, every pair closer than link_distance
+    linked with probability link_probability
+    kwargs:
+        num_creatures: int
+            number of salps
+        starting_point: list
+            center of the group
+        direction_vector: list
+            direction of thrust
+        distance: float
+            lattice spacing, jitter keeps salps at least distance / 2 apart
+        link_distance: float
+            longest possible link, defaults to 1.5 * distance
+        link_probability: float
+            chance that a pair within link_distance is linked
+        seed: int
+            seed of the layout and the links"""
+
+    def __init__(self, **kwargs):
+        super().__init__()
+        self.num_creatures = kwargs['num_creatures']
+        self.starting_point = Vec2d(*kwargs['starting_point'])
+        self.direction_vector = Vec2d(*kwargs['direction_vector']).normalized()
+        self.distance = kwargs['distance']
+        self.link_distance = kwargs.get('link_distance') or 1.5 * self.distance
+        self.link_probability = kwargs.get('link_probability', 0.5)
+        self.seed = kwargs.get('seed', 0)
+        self.side = int(np.ceil(np.sqrt(self.num_creatures)))
+
+    @cached_property
+    def _lattice(self):
+        """Jittered lattice coordinates in units of distance, and the lattice cell of every salp"""
+        rng = np.random.default_rng(self.seed)
+        cells = np.stack(np.divmod(np.arange(self.num_creatures), self.side), axis=1)
+        coordinates = cells + rng.uniform(-0.25, 0.25, size=(self.num_creatures, 2))
+        return coordinates, cells
+
+    def build_positions(self) -> np.ndarray:
+        coordinates, _ = self._lattice
+        return np.array(self.starting_point) + (coordinates - (self.side - 1) / 2) * self.distance
+
+    def build_edges(self) -> np.ndarray:
+        coordinates, cells = self._lattice
+        rng = np.random.default_rng([self.seed, 1])
+        reach = int(np.ceil(self.link_distance / self.distance + 0.5))
+        cell_index = np.full((self.side + 2 * reach, self.side + 2 * reach), -1, dtype=np.int64)
+        cell_index[cells[:, 0] + reach, cells[:, 1] + reach] = np.arange(self.num_creatures)
 
-        return positions
+        edges = []
+        for dx in range(0, reach + 1):
+            for dy in range(-reach, reach + 1):
+                # visit every pair of cells once, skipping cells too far apart even after jitter
+                if (dx == 0 and dy <= 0) or np.hypot(dx, dy) - np.sqrt(0.5) > self.link_distance / self.distance:
+                    continue
+                others = cell_index[cells[:, 0] + reach + dx, cells[:, 1] + reach + dy]
+                valid = others >= 0
+                first = np.flatnonzero(valid)
+                second = others[valid]
+                close = (np.sum((coordinates[first] - coordinates[second]) ** 2, axis=1)
+                         <= (self.link_distance / self.distance) ** 2)
+                edges.append(np.stack((first[close], second[close]), axis=1))
+        edges = np.concatenate(edges) if edges else np.zeros((0, 2), dtype=np.int64)
+        return edges[rng.random(len(edges)) < self.link_probability]
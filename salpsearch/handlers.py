@@ -1,49 +1,14 @@
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from dataclasses import dataclass
 
 from math import radians
 
-import pygame
+import numpy as np
 import pymunk
 from pymunk import Vec2d
 from pymunk.constraints import DampedSpring, RotaryLimitJoint, PinJoint
-from helpers import FastFunctions, convert_coordinates
-
-
-# Render Handlers
-class RenderHandler(ABC):
-    def __init__(self):
-        pass
-
-    @abstractmethod
-    def get_game_position(self, physics_position):
-        raise NotImplementedError
-
-    @abstractmethod
-    def draw_salp(self, salp):
-        raise NotImplementedError
-
-    @abstractmethod
-    def draw_connection(self, salp1, salp2):
-        raise NotImplementedError
-
-
-class PygameHandler(RenderHandler):
-    def __init__(self):
-        super().__init__()
-        self.disp = 800
-        self.screen = pygame.display.set_mode((self.disp, self.disp))
-
-    def get_game_position(self, physics_position):
-        x, y = convert_coordinates(physics_position, self.disp)
-        return x, y
-
-    def draw_salp(self, salp):
-        x, y = convert_coordinates(salp.body.position, self.disp)
-        pygame.draw.circle(self.screen, (153, 255, 204), (x, y), salp.radius)
-
-    def draw_connection(self, salp1, salp2):
-        pygame.draw.aaline(self.screen, (0, 0, 0), self.get_game_position(salp1), self.get_game_position(salp2))
+from helpers import FastFunctions, ConcentrationRasterizer
 
 
 # Physics Handlers
@@ -60,6 +25,17 @@ class CreaturePhysicsHandler(ABC):
     def add_body(self, body, shape):
         raise NotImplementedError
 
+    def create_bodies(self, radius, positions, angle=0.):
+        """One body per row of positions, subclasses should add them to the space in bulk"""
+        bodies = [self.create_body(radius, tuple(pos)) for pos in positions]
+        for body in bodies:
+            body.angle = angle
+        return bodies
+
+    def remove_body(self, body):
+        if body.space is not None:
+            self.space.remove(body, *body.shapes)
+
 
 class SalpPhysicsHandler(CreaturePhysicsHandler):
     def __init__(self, space: pymunk.Space):
@@ -77,82 +53,94 @@ class SalpPhysicsHandler(CreaturePhysicsHandler):
     def add_body(self, body, shape):
         self.space.add(body, shape)
 
+    def create_bodies(self, radius, positions, angle=0.):
+        bodies = []
+        shapes = []
+        for x, y in np.asarray(positions, dtype=np.float64).tolist():
+            body = pymunk.Body(mass=1, moment=10)
+            body.position = x, y
+            body.angle = angle
+            shape = pymunk.Circle(body, radius)
+            shape.density = 1
+            bodies.append(body)
+            shapes.append(shape)
+        self.space.add(*bodies, *shapes)
+        return bodies
+
 
 class LinkHandler(ABC):
-    def __init__(self):
+    """collide_bodies: whether the two linked bodies still collide with each other. Off by default, so
+    neighbours in a chain generate no collision pairs"""
+    def __init__(self, space: pymunk.Space, collide_bodies: bool = False):
         super().__init__()
+        self.space = space
+        self.collide_bodies = collide_bodies
 
     @abstractmethod
-    def add_link(self, body1, body2):
+    def make_link(self, body1, body2) -> pymunk.Constraint:
+        """Constraint between two bodies, not yet added to the space"""
         raise NotImplementedError
 
+    def add_link(self, body1, body2):
+        self.add_links([(body1, body2)])
+
+    def add_links(self, body_pairs):
+        """Links every (body1, body2) pair, adding all constraints to the space in one call"""
+        links = []
+        for body1, body2 in body_pairs:
+            link = self.make_link(body1, body2)
+            link.collide_bodies = self.collide_bodies
+            links.append(link)
+        self.space.add(*links)
+
 
 class PinHandler(LinkHandler):
-    def __init__(self, space: pymunk.Space):
-        super().__init__()
-        self.space = space
+    """Pinned bodies keep their distance, so by default they skip collision checks against each other"""
+    def __init__(self, space: pymunk.Space, collide_bodies: bool = False):
+        super().__init__(space, collide_bodies=collide_bodies)
 
-    def add_link(self, body1, body2):
-        link = PinJoint(body1, body2, (0, 0), (0, 0))
-        self.space.add(link)
+    def make_link(self, body1, body2):
+        return PinJoint(body1, body2, (0, 0), (0, 0))
 
 
 class RotaryLimitHandler(LinkHandler):
-    def __init__(self, space: pymunk.Space):
-        super().__init__()
-        self.space = space
-        self.max = radians(-20)
-        self.min = radians(20)
+    """min and max are relative angles in degrees"""
+    def __init__(self, space: pymunk.Space, min: float = -20, max: float = 20, collide_bodies: bool = False):
+        super().__init__(space, collide_bodies=collide_bodies)
+        self.min = min
+        self.max = max
 
     @property
     def min(self):
-        return self.min
+        return self._min
 
     @min.setter
     def min(self, min):
-        self.min = radians(min)
+        self._min = radians(min)
 
     @property
     def max(self):
-        return self.max
+        return self._max
 
     @max.setter
     def max(self, max):
-        self.max = radians(max)
+        self._max = radians(max)
 
-    def add_link(self, body1, body2):
-        link = RotaryLimitJoint(body1, body2, min=self.min, max=self.max)
-        self.space.add(link)
+    def make_link(self, body1, body2):
+        return RotaryLimitJoint(body1, body2, min=self.min, max=self.max)
 
 
 class DampedSpringHandler(LinkHandler):
-    def __init__(self, space: pymunk.Space):
-        super().__init__()
-        self.space = space
-        self.stiffness = 200
-        self.damping = 20
-
-    @property
-    def stiffness(self):
-        return self.stiffness
-
-    @stiffness.setter
-    def stiffness(self, stiffness):
+    def __init__(self, space: pymunk.Space, stiffness: float = 200, damping: float = 20,
+                 collide_bodies: bool = False):
+        super().__init__(space, collide_bodies=collide_bodies)
         self.stiffness = stiffness
-
-    @property
-    def damping(self):
-        return self.damping
-
-    @damping.setter
-    def damping(self, damping):
         self.damping = damping
 
-    def add_link(self, body1, body2):
-        rest_length = (body1.pos - body2.pos).length
-        link = DampedSpring(body1, body2, (0, 0), (0, 0), rest_length=rest_length,
+    def make_link(self, body1, body2):
+        rest_length = (body1.position - body2.position).length
+        return DampedSpring(body1, body2, (0, 0), (0, 0), rest_length=rest_length,
                             stiffness=self.stiffness, damping=self.damping)
-        self.space.add(link)
 
 
 # Concentration Handlers
@@ -160,17 +148,20 @@ class ConcentrationSpace:
     def __init__(self, origin):
         self.origin: tuple = origin
         self.t: float = 0
+        # size of the last step, None before the first one
+        self.dt: float = None
 
     @property
     def origin(self):
-        return Vec2d(self.origin)
+        return Vec2d(*self._origin)
 
     @origin.setter
     def origin(self, origin: tuple):
-        self.origin = origin
+        self._origin = tuple(origin)
 
     def step(self, dt):
         self.t += dt
+        self.dt = dt
 
 
 class ConcentrationHandler(ABC):
@@ -182,12 +173,17 @@ class ConcentrationHandler(ABC):
     def get_conc(self, pos):
         raise NotImplementedError
 
+    def get_conc_many(self, positions: np.ndarray) -> np.ndarray:
+        """Concentrations at an (N, 2) array of physics positions.
+        Handlers with a vectorized field should override this; the default falls back to get_conc"""
+        return np.array([self.get_conc(Vec2d(x, y)) for x, y in positions])
+
 
 class FicksConcentrationHandler(ConcentrationHandler):
-    def __init__(self, concentration_space: ConcentrationSpace):
+    def __init__(self, concentration_space: ConcentrationSpace, D: float = 0.002):
         super().__init__(concentration_space=concentration_space)
         self.ff = FastFunctions()
-        self.D = None
+        self.D = D
         self.disp = 800
 
     def scale_position(self, pos):
@@ -198,3 +194,368 @@ class FicksConcentrationHandler(ConcentrationHandler):
                              self.scale_position(self.concentration_space.origin),
                              self.concentration_space.t,
                              self.D)
+
+    def render(self, rasterizer: ConcentrationRasterizer, origin=None, t=None) -> np.ndarray:
+        """Draws the field into the rasterizer's buffer in screen orientation (y pointing down).
+        origin and t default to the current state of the concentration space"""
+        x, y = self.concentration_space.origin if origin is None else origin
+        t = self.concentration_space.t if t is None else t
+        return rasterizer.render((x / self.disp, 1 - y / self.disp), t, self.D)
+
+    def get_conc_many(self, positions: np.ndarray) -> np.ndarray:
+        return self.ff.ficks_many(np.asarray(positions, dtype=np.float64) / self.disp,
+                                  self.scale_position(self.concentration_space.origin),
+                                  float(self.concentration_space.t),
+                                  self.D)
+
+
+class CachedFicksConcentrationHandler(FicksConcentrationHandler):
+    """Serves Fick's law concentrations from rasterized copies of the field, queried by bilinear interpolation.
+    The field's peak K / sqrt(t) bounds how fast it changes, |dc/dt| <= K / (2 t^1.5), so the slices sit on a
+    time grid evenly spaced in K / sqrt(t): a query is answered from the nearest slice in time with at most
+    tolerance / 2 of time error, and slices grow further apart as the field flattens. The most recently used
+    slices are kept in a bounded LRU cache.
+
+    Early on the field changes too fast for a slice to outlast min_reuse steps, and those queries are computed
+    exactly (for D = 0.002 at 15 fps, the first 14 s). A slice costs about as much as one exact query of
+    10,000 salps, and an interpolated query is about as fast as numba's exact one, so for the single-source
+    field this handler is at best on par with FicksConcentrationHandler, and slower for a few salps. It only
+    pays off when many salps query a field that is costly to evaluate and changes slowly against the frame rate.
+
+    kwargs:
+        resolution: int
+            starting number of grid cells per side of the display
+        max_resolution: int
+            grids are refined by doubling up to this resolution until they meet tolerance / 2
+        cache_size: int
+            number of time slices kept
+        tolerance: float
+            largest allowed absolute error against the exact field before truncation to int, split evenly
+            between the spatial error (checked at cell centers, where bilinear error peaks) and the time
+            between a query and its slice. Slices that cannot meet it at max_resolution are computed exactly
+        min_reuse: int
+            slices are only built once each would serve at least this many steps of the concentration space"""
+
+    def __init__(self, concentration_space: ConcentrationSpace, D: float = 0.002,
+                 resolution: int = 128, max_resolution: int = 1024, cache_size: int = 8,
+                 tolerance: float = 1.0, min_reuse: int = 4):
+        super().__init__(concentration_space=concentration_space, D=D)
+        self.resolution = resolution
+        self.max_resolution = max_resolution
+        self.cache_size = cache_size
+        self.tolerance = tolerance
+        self.min_reuse = min_reuse
+        # peak concentration times sqrt(t)
+        self.peak_scale = 60 / np.sqrt(12.56 * D)
+        self.slices = OrderedDict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # slices are rebuilt on demand and would dominate the size of a checkpoint
+        state['slices'] = OrderedDict()
+        return state
+
+    def slice_index(self, t: float) -> int:
+        """Index of the slice nearest to t, on a grid with one slice per tolerance of change in the peak.
+        The field moves by at most the change in its peak, so the nearest slice is within tolerance / 2"""
+        return int(round(self.peak_scale / np.sqrt(t) / self.tolerance))
+
+    def slice_time(self, index: int) -> float:
+        return (self.peak_scale / (index * self.tolerance)) ** 2
+
+    def worth_caching(self, t: float) -> bool:
+        """Whether a slice at t outlasts min_reuse steps of the concentration space"""
+        dt = self.concentration_space.dt
+        if dt is None:
+            return False
+        peak_change_per_step = self.peak_scale * dt / (2 * t ** 1.5)
+        return self.min_reuse * peak_change_per_step <= self.tolerance
+
+    def exact_field(self, nodes: np.ndarray, origin: tuple, t: float) -> np.ndarray:
+        """Field on the outer product of nodes, using the separability of the gaussian"""
+        denominator = 4 * self.D * t
+        ex = np.exp(-(nodes - origin[0]) ** 2 / denominator)
+        ey = np.exp(-(nodes - origin[1]) ** 2 / denominator)
+        return (60 / np.sqrt(12.56 * self.D * t)) * np.outer(ex, ey)
+
+    def rasterize(self, origin: tuple, t: float):
+        """Returns the coarsest grid within tolerance / 2, or None if the exact field must be used"""
+        resolution = self.resolution
+        while resolution <= self.max_resolution:
+            nodes = np.linspace(0, 1, resolution + 1)
+            grid = self.exact_field(nodes, origin, t)
+            centers = (nodes[:-1] + nodes[1:]) / 2
+            interpolated = (grid[:-1, :-1] + grid[1:, :-1] + grid[:-1, 1:] + grid[1:, 1:]) / 4
+            if np.max(np.abs(interpolated - self.exact_field(centers, origin, t))) <= self.tolerance / 2:
+                return grid
+            resolution *= 2
+        return None
+
+    def get_slice(self, origin: tuple, index: int):
+        key = (origin, index)
+        if key in self.slices:
+            self.slices.move_to_end(key)
+            return self.slices[key]
+
+        grid = self.rasterize(origin, self.slice_time(index))
+        self.slices[key] = grid
+        if len(self.slices) > self.cache_size:
+            self.slices.popitem(last=False)
+        return grid
+
+    def get_conc(self, pos):
+        return int(self.get_conc_many(np.array([[pos.x, pos.y]]))[0])
+
+    def get_conc_many(self, positions: np.ndarray) -> np.ndarray:
+        points = np.asarray(positions, dtype=np.float64) / self.disp
+        origin = self.scale_position(self.concentration_space.origin)
+        t = float(self.concentration_space.t)
+        if t == 0 or not self.worth_caching(t):
+            return self.ff.ficks_many(points, origin, t, self.D)
+
+        index = self.slice_index(t)
+        # past the last slice the whole field is below tolerance / 2
+        grid = None if index == 0 else self.get_slice(origin, index)
+        if grid is None:
+            return self.ff.ficks_many(points, origin, t, self.D)
+        return self.ff.interpolate_ficks_many(grid, points, origin, self.slice_time(index), self.D)
+
+
+class MultiSourceConcentrationHandler(ConcentrationHandler):
+    """Superposition of Fick's law fields from many point sources, each with its own position, release time,
+    diffusion coefficient and amount. Sources are binned into a uniform grid, and a query only visits the
+    cells within the cutoff radius beyond which no source can add more than tolerance.
+
+    kwargs:
+        sources: list of dict
+            position: (x, y) in physics coordinates, release_time: float (default 0),
+            D: float (defaults to the handler's D), amount: float (default 60, as in ficks)
+        cell_size: float
+            grid cell size in physics units
+        tolerance: float
+            largest concentration a single ignored source may contribute
+        max_cutoff: float
+            upper bound on the cutoff radius in physics units, None for no bound"""
+
+    def __init__(self, concentration_space: ConcentrationSpace, D: float = 0.002, sources: list = (),
+                 cell_size: float = 50, tolerance: float = 0.5, max_cutoff: float = None):
+        super().__init__(concentration_space=concentration_space)
+        self.ff = FastFunctions()
+        self.D = D
+        self.disp = 800
+        self.tolerance = tolerance
+        self.max_cutoff = None if max_cutoff is None else max_cutoff / self.disp
+        self.cell_size = cell_size / self.disp
+        self.set_sources(sources)
+
+    def set_sources(self, sources: list):
+        """Replaces all sources and rebuilds the spatial index"""
+        self.source_positions = np.array([source['position'] for source in sources],
+                                         dtype=np.float64).reshape(-1, 2) / self.disp
+        self.source_release = np.array([source.get('release_time', 0.) for source in sources], dtype=np.float64)
+        self.source_D = np.array([source.get('D', self.D) for source in sources], dtype=np.float64)
+        self.source_amount = np.array([source.get('amount', 60.) for source in sources], dtype=np.float64)
+
+        if len(sources) == 0:
+            self.grid_origin = (0., 0.)
+            self.grid_shape = (1, 1)
+            cells = np.zeros(0, dtype=np.int64)
+        else:
+            self.grid_origin = tuple(self.source_positions.min(axis=0))
+            extent = self.source_positions.max(axis=0) - self.source_positions.min(axis=0)
+            self.grid_shape = tuple(int(e // self.cell_size) + 1 for e in extent)
+            cell_xy = ((self.source_positions - self.grid_origin) // self.cell_size).astype(np.int64)
+            cells = cell_xy[:, 0] * self.grid_shape[1] + cell_xy[:, 1]
+
+        # counting sort of sources by cell, CSR style
+        self.cell_sources = np.argsort(cells, kind='stable').astype(np.int64)
+        counts = np.bincount(cells, minlength=self.grid_shape[0] * self.grid_shape[1])
+        self.cell_start = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    def cutoff_radius(self, t: float) -> float:
+        """Scaled distance beyond which every source active at t contributes less than tolerance"""
+        elapsed = t - self.source_release
+        active = elapsed > 0
+        if not np.any(active):
+            return 0.
+        dt4 = 4 * self.source_D[active] * elapsed[active]
+        peak = self.source_amount[active] / np.sqrt(3.14 * dt4)
+        # amount / sqrt(pi 4Dt) * exp(-r^2 / 4Dt) < tolerance  <=>  r^2 > 4Dt ln(peak / tolerance)
+        r2 = dt4 * np.log(np.maximum(peak / self.tolerance, 1.))
+        cutoff = float(np.sqrt(r2.max()))
+        return cutoff if self.max_cutoff is None else min(cutoff, self.max_cutoff)
+
+    def get_conc(self, pos):
+        return int(self.get_conc_many(np.array([[pos.x, pos.y]]))[0])
+
+    def get_conc_many(self, positions: np.ndarray) -> np.ndarray:
+        t = float(self.concentration_space.t)
+        reach = int(np.ceil(self.cutoff_radius(t) / self.cell_size))
+        return self.ff.multi_source_ficks_many(np.asarray(positions, dtype=np.float64) / self.disp,
+                                               self.source_positions, self.source_release, self.source_D,
+                                               self.source_amount, self.cell_start, self.cell_sources,
+                                               self.grid_origin, self.cell_size, self.grid_shape, reach, t)
+
+
+class GridConcentrationHandler(ConcentrationHandler):
+    """Concentration field solved on an n x n grid over the display by a spectral diffusion-advection scheme,
+        dc/dt = D lap(c) - u . grad(c) - decay c + emission
+    Each Fourier mode is advanced by its exact propagator exp((-D |k|^2 - i k.u - decay) dt), so the scheme
+    is stable for any dt, and a constant emission at the concentration origin is integrated exactly too.
+    Absorbing boundaries and uptake by the salps are applied in real space by operator splitting, in
+    substeps of at most max_substep. The grid follows the ConcentrationSpace lazily: it is advanced to the
+    space's t whenever it is queried, so stepping the space stays free. Queries interpolate bilinearly.
+
+    Coordinates and D are on the display scaled to the unit square, as for FicksConcentrationHandler.
+
+    kwargs:
+        resolution: int
+            grid cells per side
+        current: (float, float)
+            uniform flow velocity in physics units per second
+        decay: float
+            first order decay rate per second
+        amount: float
+            mass released at the concentration origin at t = 0
+        emission: float
+            mass released per second at the concentration origin
+        uptake: float
+            rate per second at which a queried salp removes the concentration from the cell it occupies
+        boundary: str
+            'periodic', or 'absorbing' to damp the field in a sponge layer along the edges
+        sponge_width: float
+            width of the absorbing layer as a fraction of the display
+        sponge_rate: float
+            largest damping rate per second inside the absorbing layer
+        max_substep: float
+            longest step between real space corrections, only used by uptake and absorbing boundaries"""
+
+    def __init__(self, concentration_space: ConcentrationSpace, D: float = 0.002, resolution: int = 512,
+                 current: tuple = (0., 0.), decay: float = 0., amount: float = 10., emission: float = 0.,
+                 uptake: float = 0., boundary: str = 'periodic', sponge_width: float = 0.05,
+                 sponge_rate: float = 20., max_substep: float = 1 / 15):
+        super().__init__(concentration_space=concentration_space)
+        if boundary not in ('periodic', 'absorbing'):
+            raise ValueError('unknown boundary %r' % boundary)
+        self.ff = FastFunctions()
+        self.D = D
+        self.disp = 800
+        self.resolution = resolution
+        self.current = (current[0] / self.disp, current[1] / self.disp)
+        self.decay = decay
+        self.emission = emission
+        self.uptake = uptake
+        self.max_substep = max_substep
+
+        k = 2 * np.pi * np.fft.fftfreq(resolution, 1 / resolution)
+        kx = k[:, None]
+        ky = k[None, :resolution // 2 + 1]
+        self.rate = -D * (kx ** 2 + ky ** 2) - 1j * (kx * self.current[0] + ky * self.current[1]) - decay
+        self.propagators = {}
+        self.sources = {}
+
+        self.damping = None
+        if boundary == 'absorbing':
+            nodes = np.arange(resolution) / resolution
+            edge = np.minimum(nodes, 1 - nodes)
+            ramp = np.clip(1 - edge / sponge_width, 0, 1) ** 2
+            self.damping = sponge_rate * np.maximum(ramp[:, None], ramp[None, :])
+
+        self.t = float(concentration_space.t)
+        self.spectrum = amount * self.point_source(self.concentration_space.origin)
+        self.field = None
+        # flat indices of the cells queried since the last advance, drained by uptake
+        self.occupied = np.zeros(0, dtype=np.int64)
+
+    def point_source(self, pos) -> np.ndarray:
+        """Spectrum of a unit mass at pos, deposited bilinearly onto the grid"""
+        key = tuple(pos)
+        if key in self.sources:
+            return self.sources[key]
+        n = self.resolution
+        grid = np.zeros((n, n))
+        u = pos[0] / self.disp * n
+        v = pos[1] / self.disp * n
+        i, j = int(np.floor(u)), int(np.floor(v))
+        fu, fv = u - i, v - j
+        cell_mass = n * n
+        for di, dj, weight in ((0, 0, (1 - fu) * (1 - fv)), (1, 0, fu * (1 - fv)),
+                               (0, 1, (1 - fu) * fv), (1, 1, fu * fv)):
+            grid[(i + di) % n, (j + dj) % n] += weight * cell_mass
+        self.sources = {key: np.fft.rfft2(grid)}
+        return self.sources[key]
+
+    def propagator(self, dt: float):
+        """exp(rate dt) and the exact integral of a constant source over dt, (exp(rate dt) - 1) / rate"""
+        key = round(dt, 12)
+        if key not in self.propagators:
+            decay = np.exp(self.rate * dt)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                source = np.where(self.rate == 0, dt, (decay - 1) / self.rate)
+            if len(self.propagators) >= 8:
+                self.propagators.pop(next(iter(self.propagators)))
+            self.propagators[key] = (decay, source)
+        return self.propagators[key]
+
+    def advance(self, dt: float):
+        decay, source = self.propagator(dt)
+        self.spectrum *= decay
+        if self.emission:
+            self.spectrum += self.emission * source * self.point_source(self.concentration_space.origin)
+        self.field = None
+
+        if self.damping is None and not (self.uptake and len(self.occupied)):
+            return
+        field = np.fft.irfft2(self.spectrum, s=(self.resolution, self.resolution))
+        if self.damping is not None:
+            field *= np.exp(-self.damping * dt)
+        if self.uptake and len(self.occupied):
+            field.ravel()[self.occupied] *= np.exp(-self.uptake * dt)
+        self.spectrum = np.fft.rfft2(field)
+        self.field = field
+
+    def __getstate__(self):
+        # propagator and source caches are rebuilt on demand
+        state = self.__dict__.copy()
+        state.update(propagators={}, sources={})
+        return state
+
+    def synchronize(self):
+        """Advances the grid to the time of the concentration space"""
+        remaining = float(self.concentration_space.t) - self.t
+        if remaining < -1e-12:
+            raise ValueError('concentration space went back in time, from %g to %g'
+                             % (self.t, self.concentration_space.t))
+        if remaining <= 0:
+            return
+        split = self.damping is not None or self.uptake
+        substeps = int(np.ceil(remaining / self.max_substep - 1e-9)) if split else 1
+        for _ in range(substeps):
+            self.advance(remaining / substeps)
+        self.t = float(self.concentration_space.t)
+        self.occupied = np.zeros(0, dtype=np.int64)
+
+    def get_field(self) -> np.ndarray:
+        """Current field, field[i, j] at physics position (i, j) * disp / resolution"""
+        self.synchronize()
+        if self.field is None:
+            self.field = np.fft.irfft2(self.spectrum, s=(self.resolution, self.resolution))
+        return self.field
+
+    def get_conc(self, pos):
+        return int(self.get_conc_many(np.array([[pos.x, pos.y]]))[0])
+
+    def get_conc_many(self, positions: np.ndarray) -> np.ndarray:
+        field = self.get_field()
+        points = np.asarray(positions, dtype=np.float64) / self.disp
+        cells = np.empty(len(points), dtype=np.int64)
+        concentrations = self.ff.interpolate_periodic_many(field, points, cells)
+        # several chains may query the same time, all of them take up
+        self.occupied = np.union1d(self.occupied, cells)
+        return concentrations
+
+    def copy_field(self) -> np.ndarray:
+        """Copy of the current field for drawing on another thread. The grid keeps no history and advancing it
+        is not thread safe, so there is no render: call this on the simulation's thread and draw the copy
+        with ConcentrationRasterizer.render_grid"""
+        return self.get_field().copy()
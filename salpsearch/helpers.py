@@ -1,5 +1,9 @@
 import math
-from numba import jit
+import multiprocessing
+import time
+from typing import Dict
+
+from numba import jit, prange
 import numpy as np
 
 
@@ -7,16 +11,23 @@ def convert_coordinates(point, dispY):
     return int(point[0]), int(dispY - point[1])
 
 
+def get_pool_context():
+    """Multiprocessing context for worker pools. Forking a process after a parallel numba kernel has
+    started its thread pool can deadlock the children, so workers come from a fork server instead.
+    Like spawn, the fork server imports the main module in every worker, so scripts that start a pool must
+    do so under if __name__ == '__main__': or the workers fail with "An attempt has been made to start a
+    new process before the current process has finished its bootstrapping phase"."""
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
 class FastFunctions():
-    def __init__(self):
-        # dummy calls to compile
-        convert_coordinates((0, 0), 100)
-        self.ficks((0, 0), (1, 1), 60, 0.1)
-        self.get_concentration_array((5, 5), (1, 1), 5, 0.1)
-        self.gray(np.array([[1, 2, 3], [4, 5, 6]]))
+    """numba kernels. Each one compiles on its first call, or loads from numba's on-disk cache (cache=True),
+    so a process only pays for the kernels it uses. Prebuild the cache with warm_up or warmup.py"""
 
     @staticmethod
-    @jit(nopython=True)
+    @jit(nopython=True, cache=True)
     def ficks(point, origin, t, D):
         l2 = (point[0] - origin[0]) ** 2 + (point[1] - origin[1]) ** 2
         if t == 0:
@@ -24,23 +35,211 @@ class FastFunctions():
         else:
             return int((60 / (math.sqrt(12.56 * D * t))) * np.exp(-l2 / (4 * D * t)))
 
-    @jit(nopython=True)
-    def get_concentration_array(self, concentration_function, shape, origin, t, D):
-        rows, columns = shape
-        alphaArr = np.zeros((rows, columns), dtype=np.int32)
-        for i in range(rows):
-            for j in range(columns):
-                point_conc = 255 - concentration_function((i / rows, j / columns), origin, t, D)
-                if point_conc < 0:
-                    alphaArr[i, j] = 0
-                else:
-                    alphaArr[i, j] = point_conc
-        return alphaArr
+    @staticmethod
+    @jit(nopython=True, cache=True)
+    def ficks_many(points, origin, t, D):
+        """Vectorized ficks for an (N, 2) array of scaled points"""
+        n = points.shape[0]
+        concentrations = np.empty(n, dtype=np.int64)
+        if t == 0:
+            concentrations[:] = 255
+            return concentrations
+
+        scale = 60 / math.sqrt(12.56 * D * t)
+        denominator = 4 * D * t
+        for i in range(n):
+            l2 = (points[i, 0] - origin[0]) ** 2 + (points[i, 1] - origin[1]) ** 2
+            concentrations[i] = int(scale * math.exp(-l2 / denominator))
+        return concentrations
+
+    @staticmethod
+    @jit(nopython=True, cache=True)
+    def interpolate_ficks_many(grid, points, origin, t, D):
+        """Bilinear interpolation of a ficks field rasterized on the unit square with
+        grid[i, j] at (i / cells, j / cells). Points outside the grid fall back to the exact value"""
+        cells = grid.shape[0] - 1
+        n = points.shape[0]
+        concentrations = np.empty(n, dtype=np.int64)
+        scale = 60 / math.sqrt(12.56 * D * t)
+        denominator = 4 * D * t
+        for k in range(n):
+            u = points[k, 0] * cells
+            v = points[k, 1] * cells
+            if u < 0 or v < 0 or u > cells or v > cells:
+                l2 = (points[k, 0] - origin[0]) ** 2 + (points[k, 1] - origin[1]) ** 2
+                concentrations[k] = int(scale * math.exp(-l2 / denominator))
+                continue
+            i = min(int(u), cells - 1)
+            j = min(int(v), cells - 1)
+            fu = u - i
+            fv = v - j
+            value = ((1 - fu) * (1 - fv) * grid[i, j] + fu * (1 - fv) * grid[i + 1, j]
+                     + (1 - fu) * fv * grid[i, j + 1] + fu * fv * grid[i + 1, j + 1])
+            concentrations[k] = int(value)
+        return concentrations
+
+    @staticmethod
+    @jit(nopython=True, cache=True)
+    def multi_source_ficks_many(points, source_positions, source_release, source_D, source_amount,
+                                cell_start, cell_sources, grid_origin, cell_size, grid_shape, reach, t):
+        """Superposed ficks fields of many sources, visiting only sources in grid cells within reach cells
+        of each point. cell_sources lists source indices sorted by cell, cell_start[c] is the first one of cell c"""
+        n = points.shape[0]
+        nx, ny = grid_shape
+        concentrations = np.zeros(n, dtype=np.int64)
+        for k in range(n):
+            cx = int(math.floor((points[k, 0] - grid_origin[0]) / cell_size))
+            cy = int(math.floor((points[k, 1] - grid_origin[1]) / cell_size))
+            total = 0.
+            for gx in range(max(cx - reach, 0), min(cx + reach + 1, nx)):
+                for gy in range(max(cy - reach, 0), min(cy + reach + 1, ny)):
+                    cell = gx * ny + gy
+                    for m in range(cell_start[cell], cell_start[cell + 1]):
+                        s = cell_sources[m]
+                        elapsed = t - source_release[s]
+                        if elapsed <= 0:
+                            continue
+                        dx = points[k, 0] - source_positions[s, 0]
+                        dy = points[k, 1] - source_positions[s, 1]
+                        l2 = dx ** 2 + dy ** 2
+                        dt4 = 4 * source_D[s] * elapsed
+                        total += source_amount[s] / math.sqrt(3.14 * dt4) * math.exp(-l2 / dt4)
+            concentrations[k] = int(total)
+        return concentrations
+
+    @staticmethod
+    @jit(nopython=True, cache=True)
+    def jet_decision_kernel(voltage, baseline, step, concentrations, draws, fired):
+        """Fused firing decision and voltage update for a whole swarm, mirroring Salp.jet_decision:
+        a salp fires if either of its two draws falls under its voltage, only a first draw firing resets it"""
+        for i in range(voltage.shape[0]):
+            v = voltage[i]
+            if draws[i, 0] < v:
+                fired[i] = True
+                voltage[i] = baseline[i]
+            elif draws[i, 1] < v:
+                fired[i] = True
+            else:
+                fired[i] = False
+                voltage[i] = v + step[i] * (1 - math.tanh(concentrations[i] / 255))
+
+    @staticmethod
+    @jit(nopython=True, cache=True)
+    def interpolate_periodic_many(grid, points, cells):
+        """Bilinear interpolation of an (n, n) field on the periodic unit square with grid[i, j] at
+        (i / n, j / n). The flat index of the nearest lower-left node of every point is written into cells"""
+        size = grid.shape[0]
+        n = points.shape[0]
+        concentrations = np.empty(n, dtype=np.int64)
+        for k in range(n):
+            u = points[k, 0] * size
+            v = points[k, 1] * size
+            fi = math.floor(u)
+            fj = math.floor(v)
+            fu = u - fi
+            fv = v - fj
+            i = int(fi) % size
+            j = int(fj) % size
+            i1 = (i + 1) % size
+            j1 = (j + 1) % size
+            value = ((1 - fu) * (1 - fv) * grid[i, j] + fu * (1 - fv) * grid[i1, j]
+                     + (1 - fu) * fv * grid[i, j1] + fu * fv * grid[i1, j1])
+            cells[k] = i * size + j
+            concentrations[k] = int(max(value, 0.))
+        return concentrations
 
     @staticmethod
-    @jit(nopython=True)
-    def gray(im):
-        w, h = im.shape
-        ret = np.empty((w, h, 3), dtype=np.uint8)
-        ret[:, :, 2] = ret[:, :, 1] = ret[:, :, 0] = im
-        return ret
+    @jit(nopython=True, parallel=True, cache=True)
+    def get_concentration_array(buffer, origin, t, D, downsample):
+        """Writes 255 - ficks for pixel (i, j) at (i / rows, j / columns) into all three channels of a
+        (rows, columns, 3) uint8 buffer, evaluated every downsample pixels and upscaled by repetition.
+        The gaussian is separable, so only one exp per grid row and column is needed"""
+        rows, columns = buffer.shape[0], buffer.shape[1]
+        if t == 0:
+            buffer[:] = 0
+            return
+
+        low_rows = (rows + downsample - 1) // downsample
+        low_columns = (columns + downsample - 1) // downsample
+        denominator = 4 * D * t
+        ex = np.empty(low_rows)
+        ey = np.empty(low_columns)
+        for a in range(low_rows):
+            ex[a] = math.exp(-((a * downsample) / rows - origin[0]) ** 2 / denominator)
+        for b in range(low_columns):
+            ey[b] = math.exp(-((b * downsample) / columns - origin[1]) ** 2 / denominator)
+
+        scale = 60 / math.sqrt(12.56 * D * t)
+        for a in prange(low_rows):
+            row_scale = scale * ex[a]
+            for b in range(low_columns):
+                value = 255 - int(row_scale * ey[b])
+                if value < 0:
+                    value = 0
+                for i in range(a * downsample, min((a + 1) * downsample, rows)):
+                    for j in range(b * downsample, min((b + 1) * downsample, columns)):
+                        buffer[i, j, 0] = value
+                        buffer[i, j, 1] = value
+                        buffer[i, j, 2] = value
+
+
+# one call per kernel with the argument types the simulation passes, compiled by warm_up
+WARM_UP_CALLS = {
+    'ficks': lambda: FastFunctions.ficks((0., 0.), (1., 1.), 60., 0.1),
+    'ficks_many': lambda: FastFunctions.ficks_many(np.zeros((1, 2)), (1., 1.), 60., 0.1),
+    'interpolate_ficks_many': lambda: FastFunctions.interpolate_ficks_many(np.zeros((2, 2)), np.zeros((1, 2)),
+                                                                           (1., 1.), 60., 0.1),
+    'jet_decision_kernel': lambda: FastFunctions.jet_decision_kernel(
+        np.zeros(1), np.zeros(1), np.zeros(1), np.zeros(1, dtype=np.int64), np.zeros((1, 2)),
+        np.zeros(1, dtype=np.bool_)),
+    'multi_source_ficks_many': lambda: FastFunctions.multi_source_ficks_many(
+        np.zeros((1, 2)), np.zeros((1, 2)), np.zeros(1), np.ones(1), np.ones(1), np.array([0, 1], dtype=np.int64),
+        np.zeros(1, dtype=np.int64), (0., 0.), 1., (1, 1), 1, 1.),
+    'interpolate_periodic_many': lambda: FastFunctions.interpolate_periodic_many(
+        np.zeros((2, 2)), np.zeros((1, 2)), np.zeros(1, dtype=np.int64)),
+    'get_concentration_array': lambda: FastFunctions.get_concentration_array(
+        np.zeros((1, 1, 3), dtype=np.uint8), (1., 1.), 60., 0.1, 1),
+}
+
+
+def warm_up(kernels=None) -> Dict[str, float]:
+    """Compiles kernels (all by default) so their machine code lands in numba's cache, returns seconds per kernel.
+    Later processes load the cached code in milliseconds instead of compiling"""
+    seconds = {}
+    for name in WARM_UP_CALLS if kernels is None else kernels:
+        start = time.perf_counter()
+        WARM_UP_CALLS[name]()
+        seconds[name] = time.perf_counter() - start
+    return seconds
+
+
+class ConcentrationRasterizer:
+    """Renders the concentration field as a grayscale RGB image ready for pygame.surfarray.blit_array.
+    The image buffer is allocated once and overwritten on every render.
+
+    kwargs:
+        shape: tuple
+            (rows, columns) of the output image
+        downsample: int
+            evaluate the field every downsample pixels, 1 renders at full resolution"""
+
+    def __init__(self, shape, downsample: int = 1):
+        rows, columns = shape
+        self.downsample = downsample
+        self.buffer = np.zeros((rows, columns, 3), dtype=np.uint8)
+
+    def render(self, origin, t, D) -> np.ndarray:
+        """origin is in image coordinates scaled to the unit square"""
+        FastFunctions.get_concentration_array(self.buffer, (float(origin[0]), float(origin[1])), float(t), D,
+                                              self.downsample)
+        return self.buffer
+
+    def render_grid(self, field: np.ndarray) -> np.ndarray:
+        """field is a square grid over the display with field[i, j] at physics position (i, j) * disp / n,
+        as kept by GridConcentrationHandler. Sampled at the nearest node"""
+        rows, columns = self.buffer.shape[0], self.buffer.shape[1]
+        resolution = field.shape[0]
+        i = np.arange(rows) * resolution // rows
+        j = (columns - 1 - np.arange(columns)) * resolution // columns
+        self.buffer[:] = (255 - np.clip(field[np.ix_(i, j)], 0, 255)).astype(np.uint8)[:, :, None]
+        return self.buffer
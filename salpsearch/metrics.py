@@ -0,0 +1,207 @@
+"""Trajectory metrics on recorded state arrays, vectorized over any number of leading batch axes.
+
+Arrays follow the layout of recording.TrajectoryRecorder, with optional leading run axes:
+    positions: (..., steps, creatures, 2)
+    fired: (..., steps, creatures)
+so the metrics of 10,000 runs of equal length are one call on arrays stacked along a first axis
+(see load_recordings). MetricsCollector computes the same metrics online from a running Simulation.
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+
+from recording import TrajectoryReader
+
+
+def centroids(positions: np.ndarray) -> np.ndarray:
+    """(..., steps, 2) mean position of all creatures"""
+    return positions.mean(axis=-2)
+
+
+def chain_centroids(positions: np.ndarray, offsets: Sequence[int]) -> np.ndarray:
+    """(..., steps, chains, 2) mean position of each chain, offsets as in Simulation.offsets"""
+    offsets = np.asarray(offsets)
+    sums = np.add.reduceat(positions, offsets[:-1], axis=-2)
+    return sums / np.diff(offsets)[:, None]
+
+
+def distance_curves(centroid_positions: np.ndarray, source) -> np.ndarray:
+    """(..., steps) distance between centroids (..., steps, 2) and source, a point (2,) or one per run (..., 2)"""
+    source = np.asarray(source, dtype=np.float64)
+    return np.linalg.norm(centroid_positions - source[..., None, :], axis=-1)
+
+
+def time_to_target(distances: np.ndarray, times: np.ndarray, radius: float) -> np.ndarray:
+    """(...) first time at which distances (..., steps) is within radius, inf for runs that never get there"""
+    reached = distances <= radius
+    first = reached.argmax(axis=-1)
+    return np.where(reached.any(axis=-1), np.asarray(times)[first], np.inf)
+
+
+def path_lengths(centroid_positions: np.ndarray) -> np.ndarray:
+    """(...) distance travelled by the centroid"""
+    return np.linalg.norm(np.diff(centroid_positions, axis=-2), axis=-1).sum(axis=-1)
+
+
+def path_efficiency(centroid_positions: np.ndarray, source=None) -> np.ndarray:
+    """(...) net displacement over distance travelled, 1 for a straight path and 0 for no net movement.
+    With a source, the net approach towards it is used instead, which is negative for runs moving away"""
+    if source is None:
+        net = np.linalg.norm(centroid_positions[..., -1, :] - centroid_positions[..., 0, :], axis=-1)
+    else:
+        distances = distance_curves(centroid_positions[..., [0, -1], :], source)
+        net = distances[..., 0] - distances[..., 1]
+    length = path_lengths(centroid_positions)
+    return np.divide(net, length, out=np.zeros_like(net, dtype=np.float64), where=length > 0)
+
+
+def _gyration_eigenvalues(positions: np.ndarray):
+    """Eigenvalues (larger, smaller) of the 2x2 gyration tensor of every step, in closed form"""
+    centered = positions - positions.mean(axis=-2, keepdims=True)
+    xx = np.mean(centered[..., 0] ** 2, axis=-1)
+    yy = np.mean(centered[..., 1] ** 2, axis=-1)
+    xy = np.mean(centered[..., 0] * centered[..., 1], axis=-1)
+    half_trace = (xx + yy) / 2
+    spread = np.sqrt(((xx - yy) / 2) ** 2 + xy ** 2)
+    return half_trace + spread, np.maximum(half_trace - spread, 0.)
+
+
+def radius_of_gyration(positions: np.ndarray) -> np.ndarray:
+    """(..., steps) root mean square distance of the creatures from their centroid"""
+    major, minor = _gyration_eigenvalues(positions)
+    return np.sqrt(major + minor)
+
+
+def elongation(positions: np.ndarray) -> np.ndarray:
+    """(..., steps) anisotropy of the creatures' spread, 1 when they lie on a line and 0 when the spread is
+    the same in every direction"""
+    major, minor = _gyration_eigenvalues(positions)
+    total = major + minor
+    return np.divide(major - minor, total, out=np.zeros_like(total), where=total > 0)
+
+
+def firing_rates(fired: np.ndarray, dt: float) -> np.ndarray:
+    """(..., creatures) mean firings per simulated second of every creature"""
+    return fired.mean(axis=-2) / dt
+
+
+def population_rates(fired: np.ndarray, dt: float) -> np.ndarray:
+    """(..., steps) firings per creature and simulated second at each step"""
+    return fired.mean(axis=-1) / dt
+
+
+def firing_statistics(fired: np.ndarray, dt: float) -> Dict[str, np.ndarray]:
+    """Per run (...) statistics of firing:
+        mean_rate: mean firing rate over creatures
+        rate_spread: standard deviation of the creatures' rates, how unevenly they fire
+        synchrony: variance of the population rate relative to that of independent creatures firing at
+            the same rates, about 1 for independent firing and up to the number of creatures for
+            creatures that always fire together"""
+    rates = firing_rates(fired, dt)
+    probabilities = fired.mean(axis=-2)
+    population = fired.sum(axis=-1)
+    independent_variance = np.sum(probabilities * (1 - probabilities), axis=-1)
+    return {'mean_rate': rates.mean(axis=-1),
+            'rate_spread': rates.std(axis=-1),
+            'synchrony': np.divide(population.var(axis=-1), independent_variance,
+                                   out=np.zeros_like(independent_variance), where=independent_variance > 0)}
+
+
+def summarize(positions: np.ndarray, fired: np.ndarray, times: np.ndarray, source,
+              target_radius: float = 20) -> Dict[str, np.ndarray]:
+    """Every scalar metric per run (...) in one call, see the functions above"""
+    dt = float(times[1] - times[0]) if len(times) > 1 else float(times[0])
+    centroid_positions = centroids(positions)
+    distances = distance_curves(centroid_positions, source)
+    summary = {'final_distance': distances[..., -1],
+               'min_distance': distances.min(axis=-1),
+               'time_to_target': time_to_target(distances, times, target_radius),
+               'path_length': path_lengths(centroid_positions),
+               'path_efficiency': path_efficiency(centroid_positions),
+               'approach_efficiency': path_efficiency(centroid_positions, source),
+               'mean_elongation': elongation(positions).mean(axis=-1),
+               'mean_radius_of_gyration': radius_of_gyration(positions).mean(axis=-1)}
+    summary.update(firing_statistics(fired, dt))
+    return summary
+
+
+def load_recordings(paths: Sequence[str], start: int = 0, stop: int = None) -> Dict[str, np.ndarray]:
+    """Stacks steps start:stop of recordings with the same number of creatures along a new first axis.
+    Recordings shorter than the others are cut to the shortest one. Returns positions, fired, times
+    and the concentration origin of every run as source"""
+    readers = [TrajectoryReader(path) for path in paths]
+    length = min(len(reader) for reader in readers)
+    stop = length if stop is None else min(stop, length)
+    return {'positions': np.stack([reader.columns['positions'][start:stop] for reader in readers]),
+            'fired': np.stack([reader.columns['fired'][start:stop] for reader in readers]),
+            'times': readers[0].times[start:stop],
+            'source': np.array([reader.metadata['concentration_origin'] for reader in readers], dtype=np.float64)}
+
+
+class MetricsCollector:
+    """Subscribes to a Simulation and keeps the per-step reductions needed by summarize, so metrics are
+    available online without recording the full trajectory.
+
+    kwargs:
+        simulation: Simulation
+            simulation to subscribe to
+        every: int
+            steps between samples
+    """
+
+    def __init__(self, simulation, every: int = 1):
+        self.simulation = simulation
+        self.every = every
+        capacity = max(1, int(np.ceil((simulation.max_time - simulation.t) / simulation.dt / every)) + 1)
+        self.times = np.zeros(capacity)
+        self.centroids = np.zeros((capacity, 2))
+        self.elongations = np.zeros(capacity)
+        self.radii_of_gyration = np.zeros(capacity)
+        self.fired = np.zeros((capacity, simulation.num_creatures), dtype=np.bool_)
+        self.num_samples = 0
+        self.subscription = simulation.subscribe(self.sample, every)
+
+    def sample(self, state):
+        i = self.num_samples
+        if i == len(self.times):
+            self._grow()
+        self.times[i] = state.t
+        np.mean(state.positions, axis=0, out=self.centroids[i])
+        major, minor = _gyration_eigenvalues(state.positions)
+        self.radii_of_gyration[i] = np.sqrt(major + minor)
+        self.elongations[i] = (major - minor) / (major + minor) if major + minor > 0 else 0.
+        self.fired[i] = state.fired
+        self.num_samples += 1
+
+    def _grow(self):
+        for name in ('times', 'centroids', 'elongations', 'radii_of_gyration', 'fired'):
+            array = getattr(self, name)
+            grown = np.zeros((2 * len(array),) + array.shape[1:], dtype=array.dtype)
+            grown[:len(array)] = array
+            setattr(self, name, grown)
+
+    def close(self):
+        self.simulation.unsubscribe(self.subscription)
+
+    def distances(self) -> np.ndarray:
+        return distance_curves(self.centroids[:self.num_samples], self.simulation.concentration_space.origin)
+
+    def summary(self, target_radius: float = 20) -> Dict[str, float]:
+        """summarize for the samples so far. Firing statistics only see the flags of sampled steps"""
+        n = self.num_samples
+        if n == 0:
+            raise ValueError("No samples collected yet, step the simulation at least every=%s times first"
+                             % self.every)
+        source = self.simulation.concentration_space.origin
+        centroid_positions = self.centroids[:n]
+        distances = self.distances()
+        summary = {'final_distance': distances[-1],
+                   'min_distance': distances.min(),
+                   'time_to_target': time_to_target(distances, self.times[:n], target_radius),
+                   'path_length': path_lengths(centroid_positions),
+                   'path_efficiency': path_efficiency(centroid_positions),
+                   'approach_efficiency': path_efficiency(centroid_positions, source),
+                   'mean_elongation': self.elongations[:n].mean(),
+                   'mean_radius_of_gyration': self.radii_of_gyration[:n].mean()}
+        summary.update(firing_statistics(self.fired[:n], self.simulation.dt))
+        return {name: float(value) for name, value in summary.items()}
@@ -0,0 +1,77 @@
+from collections import defaultdict
+from time import perf_counter
+from typing import Dict, List
+
+import numpy as np
+
+
+class Profiler:
+    """Accumulates wall time and call counts per phase of a Simulation step, plus event counters
+    (impulses fired, constraints solved). Attach with Simulation.enable_profiling; when no profiler is
+    attached the simulation takes its uninstrumented path.
+
+    usage inside instrumented code:
+        start = profiler.start()
+        ...
+        profiler.stop('phase', start)
+
+    kwargs:
+        timeline: bool
+            also keep the time of every phase and the counters for each individual step
+    """
+
+    def __init__(self, timeline: bool = False):
+        self.times: Dict[str, float] = defaultdict(float)
+        self.calls: Dict[str, int] = defaultdict(int)
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.record_timeline = timeline
+        self.timeline: List[Dict[str, float]] = []
+        self._current_step: Dict[str, float] = defaultdict(float)
+
+    @staticmethod
+    def start() -> float:
+        return perf_counter()
+
+    def stop(self, phase: str, start: float):
+        elapsed = perf_counter() - start
+        self.times[phase] += elapsed
+        self.calls[phase] += 1
+        if self.record_timeline:
+            self._current_step[phase] += elapsed
+
+    def count(self, counter: str, amount: int = 1):
+        self.counters[counter] += amount
+        if self.record_timeline:
+            self._current_step[counter] += amount
+
+    def end_step(self, frame: int):
+        if self.record_timeline:
+            self._current_step['frame'] = frame
+            self.timeline.append(self._current_step)
+            self._current_step = defaultdict(float)
+
+    def summary(self) -> Dict[str, Dict]:
+        """Per phase total seconds, calls, mean seconds per call and share of the step time"""
+        total = self.times.get('step', sum(self.times.values())) or 1.
+        phases = {phase: {'seconds': seconds,
+                          'calls': self.calls[phase],
+                          'mean': seconds / self.calls[phase],
+                          'fraction': seconds / total}
+                  for phase, seconds in self.times.items()}
+        return {'phases': phases, 'counters': dict(self.counters)}
+
+    def timeline_array(self) -> np.ndarray:
+        """Per step timeline as a structured array with one field per phase or counter"""
+        names = sorted({name for step in self.timeline for name in step})
+        dtype = [(name, np.int64 if name == 'frame' else np.float64) for name in names]
+        return np.array([tuple(step.get(name, 0) for name in names) for step in self.timeline], dtype=dtype)
+
+    def report(self) -> str:
+        summary = self.summary()
+        lines = ['%-24s %12s %10s %12s %7s' % ('phase', 'seconds', 'calls', 'mean', 'share')]
+        for phase, stats in sorted(summary['phases'].items(), key=lambda item: -item[1]['seconds']):
+            lines.append('%-24s %12.4f %10d %12.3e %6.1f%%' % (phase, stats['seconds'], stats['calls'],
+                                                              stats['mean'], 100 * stats['fraction']))
+        for counter, value in sorted(summary['counters'].items()):
+            lines.append('%-24s %12d' % (counter, value))
+        return '\n'.join(lines)
@@ -0,0 +1,154 @@
+import json
+import os
+from typing import Dict
+
+import numpy as np
+
+# column name -> (dtype, per creature shape); frames holds one value per step rather than per creature
+COLUMNS = {
+    'frames': (np.int64, None),
+    'positions': (np.float32, (2,)),
+    'angles': (np.float32, ()),
+    'voltages': (np.float32, ()),
+    'fired': (np.bool_, ()),
+}
+
+
+def _row_shape(num_creatures: int, shape):
+    return () if shape is None else (num_creatures,) + shape
+
+
+def concentration_metadata(handler) -> Dict:
+    """JSON-serializable description of a concentration handler: its type name plus whatever parameters
+    are known to determine its field"""
+    metadata = {'type': type(handler).__name__, 'D': getattr(handler, 'D', None)}
+    if hasattr(handler, 'source_positions'):
+        metadata['sources'] = [{'position': [float(x) * handler.disp, float(y) * handler.disp],
+                                'release_time': float(release), 'D': float(D), 'amount': float(amount)}
+                               for (x, y), release, D, amount in zip(handler.source_positions,
+                                                                     handler.source_release,
+                                                                     handler.source_D, handler.source_amount)]
+    return metadata
+
+
+class TrajectoryRecorder:
+    """Records the per-step state of a Simulation's SalpChain into a directory of columnar binary files.
+    Steps are written into preallocated in-memory chunks which are appended to disk once full, so
+    recording costs one array copy per column per step. Read the result back with TrajectoryReader.
+
+    kwargs:
+        path: str
+            directory to write to, created if missing. Existing recordings are overwritten
+        chunk_steps: int
+            number of steps buffered in memory between flushes
+        metadata: dict
+            extra JSON-serializable values stored alongside the recording
+    """
+
+    def __init__(self, path: str, chunk_steps: int = 4096, metadata: Dict = None):
+        self.path = path
+        self.chunk_steps = chunk_steps
+        self.metadata = dict(metadata or {})
+        self.num_creatures = None
+        self.num_steps = 0
+        self.row = 0
+        self.buffers: Dict[str, np.ndarray] = {}
+        self.files = {}
+
+    def open(self, simulation):
+        """Allocates buffers and writes metadata for the chains of simulation, called on attach"""
+        chain = simulation.creature_chain
+        self.num_creatures = simulation.num_creatures
+        os.makedirs(self.path, exist_ok=True)
+        for name, (dtype, shape) in COLUMNS.items():
+            self.buffers[name] = np.zeros((self.chunk_steps,) + _row_shape(self.num_creatures, shape), dtype=dtype)
+            self.files[name] = open(os.path.join(self.path, name + '.bin'), 'wb')
+
+        self.metadata.update({
+            'num_creatures': self.num_creatures,
+            'dt': simulation.dt,
+            'seed': simulation.seed,
+            'radii': [float(creature.radius) for chain in simulation.creature_chains
+                      for creature in chain.creature_list],
+            'edges': [list(edge) for edge in simulation.edges],
+            'chain_offsets': list(simulation.offsets),
+            'concentration_origin': list(simulation.concentration_space.origin),
+            'concentration_handler': concentration_metadata(chain.creature.concentration_handler),
+        })
+        self.write_metadata()
+
+    def record(self, simulation):
+        row = self.row
+        self.buffers['frames'][row] = simulation.frame_counter
+        for chain, start, stop in zip(simulation.creature_chains, simulation.offsets, simulation.offsets[1:]):
+            self.buffers['positions'][row, start:stop] = chain.get_positions()
+            self.buffers['angles'][row, start:stop] = chain.get_angles()
+            self.buffers['voltages'][row, start:stop] = chain.swarm.voltage
+            self.buffers['fired'][row, start:stop] = chain.swarm.fired
+        self.row += 1
+        if self.row == self.chunk_steps:
+            self.flush()
+
+    def flush(self):
+        for name, buffer in self.buffers.items():
+            self.files[name].write(buffer[:self.row].tobytes())
+            self.files[name].flush()
+        self.num_steps += self.row
+        self.row = 0
+        self.write_metadata()
+
+    def close(self):
+        if not self.files:
+            return
+        self.flush()
+        for file in self.files.values():
+            file.close()
+        self.files = {}
+
+    def write_metadata(self):
+        self.metadata['num_steps'] = self.num_steps
+        self.metadata['columns'] = {name: [np.dtype(dtype).str, shape if shape is None else list(shape)]
+                                    for name, (dtype, shape) in COLUMNS.items()}
+        with open(os.path.join(self.path, 'meta.json'), 'w') as file:
+            json.dump(self.metadata, file)
+
+
+class TrajectoryReader:
+    """Memory-maps a recording made by TrajectoryRecorder. Slicing only reads the requested steps from disk.
+
+    reader[start:stop] returns a dict of column name -> array view, e.g.
+        reader[1000:2000]['positions']  # (1000, num_creatures, 2)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json')) as file:
+            self.metadata = json.load(file)
+        self.num_steps: int = self.metadata['num_steps']
+        self.num_creatures: int = self.metadata['num_creatures']
+        self.dt: float = self.metadata['dt']
+        self.columns: Dict[str, np.memmap] = {}
+        for name, (dtype, shape) in self.metadata['columns'].items():
+            row_shape = _row_shape(self.num_creatures, None if shape is None else tuple(shape))
+            if self.num_steps == 0:
+                self.columns[name] = np.zeros((0,) + row_shape, dtype=dtype)
+            else:
+                self.columns[name] = np.memmap(os.path.join(path, name + '.bin'), dtype=dtype, mode='r',
+                                               shape=(self.num_steps,) + row_shape)
+
+    def __len__(self):
+        return self.num_steps
+
+    def __getitem__(self, index) -> Dict[str, np.ndarray]:
+        return {name: column[index] for name, column in self.columns.items()}
+
+    @property
+    def times(self) -> np.ndarray:
+        return self.columns['frames'] * self.dt
+
+    def time_slice(self, start: float, stop: float) -> Dict[str, np.ndarray]:
+        """Steps with start <= t < stop"""
+        frames = self.columns['frames']
+        lower = np.searchsorted(frames, int(np.ceil(start / self.dt - 1e-9)), side='left')
+        upper = np.searchsorted(frames, int(np.ceil(stop / self.dt - 1e-9)), side='left')
+        return self[lower:upper]
@@ -0,0 +1,69 @@
+"""Name -> implementation registry behind factory_method and register_function.
+
+Built-in implementations are listed by "module:attribute" and only imported the first time their
+name is looked up, so importing the registry (or a module that uses it) pulls in nothing else.
+Plugins register themselves with the register_function decorator, or point at a module that has
+not been imported yet with register_lazy.
+"""
+import importlib
+from typing import Callable, Dict, List
+
+__all__ = ["factory_method", "register_function", "register_lazy", "registered_names"]
+
+__CLASS_DICT__: Dict[str, object] = dict()
+
+__LAZY_DICT__: Dict[str, str] = {
+    # physics handlers
+    'SalpPhysicsHandler': 'handlers:SalpPhysicsHandler',
+    # concentration handlers
+    'FicksConcentrationHandler': 'handlers:FicksConcentrationHandler',
+    'CachedFicksConcentrationHandler': 'handlers:CachedFicksConcentrationHandler',
+    'MultiSourceConcentrationHandler': 'handlers:MultiSourceConcentrationHandler',
+    'GridConcentrationHandler': 'handlers:GridConcentrationHandler',
+    # link handlers
+    'PinHandler': 'handlers:PinHandler',
+    'RotaryLimitHandler': 'handlers:RotaryLimitHandler',
+    'DampedSpringHandler': 'handlers:DampedSpringHandler',
+    # creature graphs
+    'LinearChain': 'graphs:LinearChain',
+    'RingChain': 'graphs:RingChain',
+    'BranchedChain': 'graphs:BranchedChain',
+    'GridLattice': 'graphs:GridLattice',
+    'RandomGraph': 'graphs:RandomGraph',
+    # renderers, these load pygame
+    'PygameHandler': 'rendering:PygameHandler',
+    'ThreadedRenderer': 'rendering:ThreadedRenderer',
+}
+
+
+def factory_method(name: str):
+    """The implementation registered under name, importing its module on first use"""
+    if name not in __CLASS_DICT__:
+        if name not in __LAZY_DICT__:
+            raise KeyError("Nothing registered as %s, known names are %s" % (name, registered_names()))
+        module_name, attribute = __LAZY_DICT__[name].split(':')
+        __CLASS_DICT__[name] = getattr(importlib.import_module(module_name), attribute)
+    return __CLASS_DICT__[name]
+
+
+def register_function(name: str) -> Callable:
+    def register_function_fn(cls):
+        if name in __CLASS_DICT__ or name in __LAZY_DICT__:
+            raise ValueError("Name %s already registered!" % name)
+        __CLASS_DICT__[name] = cls
+        return cls
+
+    return register_function_fn
+
+
+def register_lazy(name: str, target: str):
+    """Registers target, given as "module:attribute", under name without importing it"""
+    if name in __CLASS_DICT__ or name in __LAZY_DICT__:
+        raise ValueError("Name %s already registered!" % name)
+    if target.count(':') != 1:
+        raise ValueError("Lazy target %s is not of the form module:attribute" % target)
+    __LAZY_DICT__[name] = target
+
+
+def registered_names() -> List[str]:
+    return sorted(set(__CLASS_DICT__) | set(__LAZY_DICT__))
@@ -0,0 +1,160 @@
+import threading
+from abc import ABC, abstractmethod
+
+import pygame
+
+from handlers import ConcentrationHandler
+from helpers import ConcentrationRasterizer, convert_coordinates
+from simulation import SimulationSnapshot
+
+
+# Render Handlers
+class RenderHandler(ABC):
+    def __init__(self):
+        pass
+
+    @abstractmethod
+    def get_game_position(self, physics_position):
+        raise NotImplementedError
+
+    @abstractmethod
+    def draw_salp(self, salp):
+        raise NotImplementedError
+
+    @abstractmethod
+    def draw_connection(self, salp1, salp2):
+        raise NotImplementedError
+
+
+class PygameHandler(RenderHandler):
+    """Draws onto screen, which defaults to a new display window"""
+    def __init__(self, screen: pygame.Surface = None):
+        super().__init__()
+        self.disp = 800
+        self.screen = pygame.display.set_mode((self.disp, self.disp)) if screen is None else screen
+
+    def get_game_position(self, physics_position):
+        x, y = convert_coordinates(physics_position, self.disp)
+        return x, y
+
+    def draw_salp(self, salp):
+        x, y = convert_coordinates(salp.body.position, self.disp)
+        pygame.draw.circle(self.screen, (153, 255, 204), (x, y), salp.radius)
+
+    def draw_connection(self, salp1, salp2):
+        pygame.draw.aaline(self.screen, (0, 0, 0), self.get_game_position(salp1.body.position),
+                           self.get_game_position(salp2.body.position))
+
+    def draw_background(self, image):
+        """image is a (disp, disp, 3) uint8 array, e.g. from FicksConcentrationHandler.render"""
+        pygame.surfarray.blit_array(self.screen, image)
+
+    def draw_snapshot(self, snapshot, background=None):
+        """Draws a full frame from a SimulationSnapshot, without touching any live simulation objects"""
+        if background is None:
+            self.screen.fill((255, 255, 255))
+        else:
+            self.draw_background(background)
+        game_positions = [self.get_game_position(position) for position in snapshot.positions]
+        for i, j in snapshot.edges:
+            pygame.draw.aaline(self.screen, (0, 0, 0), game_positions[i], game_positions[j])
+        for position, radius in zip(game_positions, snapshot.radii):
+            pygame.draw.circle(self.screen, (153, 255, 204), position, radius)
+
+
+class ThreadedRenderer:
+    """Draws SimulationSnapshots with a PygameHandler on its own thread at a fixed, lower frame rate.
+    The thread only asks for a snapshot once it is idle, so every frame shows the newest state instead of
+    one captured a render period earlier. Holds at most one pending snapshot: submitting while a frame is
+    pending replaces it, so a slow renderer drops frames instead of slowing the simulation down.
+
+    kwargs:
+        fps: int
+            target display frame rate
+        concentration_handler: ConcentrationHandler
+            if given (and it can render), the field is drawn as the background. Snapshots that carry a copy
+            of the field are drawn from that copy instead, without touching the handler
+        downsample: int
+            background resolution divisor, see helpers.ConcentrationRasterizer
+    """
+
+    def __init__(self, fps: int = 30, concentration_handler: ConcentrationHandler = None, downsample: int = 2):
+        self.fps = fps
+        self.concentration_handler = concentration_handler
+        self.downsample = downsample
+
+        self.frames_drawn = 0
+        self.frames_dropped = 0
+        self.closed = False
+        self._pending: SimulationSnapshot = None
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        # set while the render thread is blocked waiting for its next snapshot
+        self._waiting = threading.Event()
+        self._thread = threading.Thread(target=self._render_loop, name='salp-renderer', daemon=True)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        with self._condition:
+            self._condition.notify()
+        self._thread.join()
+
+    def ready(self) -> bool:
+        """True while the render thread is idle and waiting for a snapshot, cheap enough to call every step"""
+        return self._waiting.is_set() and self._pending is None and not self.closed
+
+    def submit(self, snapshot: SimulationSnapshot):
+        with self._condition:
+            if self._pending is not None:
+                self.frames_dropped += 1
+            self._pending = snapshot
+            self._condition.notify()
+
+    def _take(self) -> SimulationSnapshot:
+        with self._condition:
+            self._waiting.set()
+            while self._pending is None and not self._stop.is_set():
+                self._condition.wait()
+            self._waiting.clear()
+            snapshot, self._pending = self._pending, None
+            return snapshot
+
+    def _render_loop(self):
+        # the display has to be created by the thread that draws to it
+        pygame.init()
+        render_handler = PygameHandler()
+        pygame.display.set_caption('Salp Search Simulation')
+        rasterizer = ConcentrationRasterizer((render_handler.disp, render_handler.disp), self.downsample)
+        draw_background = self.concentration_handler is not None and hasattr(self.concentration_handler, 'render')
+        clock = pygame.time.Clock()
+
+        while not self._stop.is_set():
+            snapshot = self._take()
+            if snapshot is None:
+                break
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.closed = True
+                    self._stop.set()
+            background = None
+            if snapshot.concentration_field is not None:
+                background = rasterizer.render_grid(snapshot.concentration_field)
+            elif draw_background:
+                background = self.concentration_handler.render(rasterizer, snapshot.concentration_origin,
+                                                               snapshot.concentration_t)
+            render_handler.draw_snapshot(snapshot, background)
+            pygame.display.flip()
+            self.frames_drawn += 1
+            clock.tick(self.fps)
+
+        pygame.quit()
@@ -0,0 +1,152 @@
+import functools
+import hashlib
+import inspect
+import json
+import math
+import os
+import sqlite3
+import time
+from dataclasses import fields, is_dataclass
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pymunk
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def canonical(obj):
+    """JSON-serialisable form of a (nested) config in which equal configs are equal.
+    Dataclasses carry their class name, since RunConfig fields like creature_graph are unions"""
+    if is_dataclass(obj) and not isinstance(obj, type):
+        return {'__type__': type(obj).__name__, **{f.name: canonical(getattr(obj, f.name)) for f in fields(obj)}}
+    if isinstance(obj, dict):
+        return {str(key): canonical(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple, np.ndarray)):
+        return [canonical(value) for value in obj]
+    if isinstance(obj, (bool, np.bool_)):
+        return bool(obj)
+    if isinstance(obj, (int, np.integer)):
+        return int(obj)
+    if isinstance(obj, (float, np.floating)):
+        # 20 from a YAML file and 20.0 from python are the same parameter
+        return int(obj) if float(obj).is_integer() else float(obj)
+    if obj is None or isinstance(obj, str):
+        return obj
+    raise TypeError("Cannot build a cache key from %s" % type(obj).__name__)
+
+
+def canonical_json(obj) -> str:
+    return json.dumps(canonical(obj), sort_keys=True, separators=(',', ':'))
+
+
+def canonical_hash(obj) -> int:
+    """64 bit hash of canonical_json(obj), stable across processes and sessions"""
+    return int.from_bytes(hashlib.sha256(canonical_json(obj).encode()).digest()[:8], 'little')
+
+
+def constructor_parameters(obj) -> dict:
+    """The constructor arguments of obj, read back from the attributes of the same name"""
+    parameters = inspect.signature(type(obj).__init__).parameters
+    return {'__type__': type(obj).__name__,
+            **{name: getattr(obj, name) for name in parameters if name != 'self' and hasattr(obj, name)}}
+
+
+@functools.lru_cache(maxsize=None)
+def code_version(source_dir: str = SOURCE_DIR) -> str:
+    """Hash of every python source under source_dir plus the numerical library versions, so results are
+    invalidated by any change to the simulation code"""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__' and not d.startswith('.'))
+        for name in sorted(files):
+            if name.endswith('.py'):
+                path = os.path.join(root, name)
+                digest.update(os.path.relpath(path, source_dir).encode())
+                with open(path, 'rb') as file:
+                    digest.update(file.read())
+    digest.update(('pymunk %s numpy %s' % (pymunk.version, np.__version__)).encode())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """Persistent store of evaluation results in an SQLite database, keyed by a hash of the resolved
+    RunConfig (seed included), the simulated time, the termination conditions and the code version.
+    The database is in WAL mode, so any number of pool workers can write to it while others read.
+    Connections are opened lazily per process, a ResultCache can be pickled to workers.
+
+    kwargs:
+        path: str
+            database file, created if it does not exist
+        version: str
+            code version mixed into every key, defaults to code_version() of the salpsearch sources
+        timeout: float
+            seconds to wait for another process's write lock before giving up
+    """
+
+    def __init__(self, path: str, version: str = None, timeout: float = 60):
+        self.path = path
+        self.version = code_version() if version is None else version
+        self.timeout = timeout
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # a connection must not be shared with forked children
+        if self._connection is None or self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=NORMAL')
+            self._connection.execute('CREATE TABLE IF NOT EXISTS results ('
+                                     'key TEXT PRIMARY KEY, fitness REAL, t REAL, terminated INTEGER, '
+                                     'config TEXT, version TEXT, created REAL)')
+            self._pid = os.getpid()
+        return self._connection
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_connection'] = None
+        state['_pid'] = None
+        return state
+
+    def key(self, config, max_time: float = None, termination_conditions: Sequence = ()) -> str:
+        """config must have its simulation seed resolved, see EvaluationEngine.resolve_seeds"""
+        if config.simulation.seed is None:
+            raise ValueError("Configs without a simulation seed are not reproducible and cannot be cached")
+        description = canonical_json({'config': config,
+                                      'max_time': config.simulation.max_time if max_time is None else max_time,
+                                      'termination': [constructor_parameters(condition)
+                                                      for condition in termination_conditions],
+                                      'version': self.version})
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Tuple[float, float, bool]]:
+        """(fitness, t, terminated) of every key already in the cache"""
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        # stay below SQLite's limit on bound parameters
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self.connection.execute('SELECT key, fitness, t, terminated FROM results WHERE key IN (%s)'
+                                           % ','.join('?' * len(batch)), batch)
+            for key, fitness, t, terminated in rows:
+                found[key] = (math.nan if fitness is None else fitness, t, bool(terminated))
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    def put(self, key: str, config, fitness: float, t: float, terminated: bool):
+        self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                (key, fitness, t, int(terminated), canonical_json(config), self.version,
+                                 time.time()))
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM results').fetchone()[0]
@@ -1,25 +1,414 @@
+from dataclasses import dataclass
+from typing import Callable, Iterator, List
+import pickle
+import zlib
+
+import numpy as np
+from pymunk import Vec2d
+
 from creature_chains import CreatureChain
+from profiling import Profiler
+from termination import TerminationCondition
+
+
+@dataclass
+class SimulationSnapshot:
+    """Copy of everything needed to draw one frame, safe to hand to another thread"""
+    frame: int
+    t: float
+    positions: np.ndarray
+    radii: List[float]
+    edges: List[tuple]
+    concentration_origin: tuple
+    concentration_t: float
+    # copy of the field for handlers that cannot recompute it from origin and t, see GridConcentrationHandler
+    concentration_field: np.ndarray = None
+
+
+class StepState:
+    """Reusable view of the per-step state of every creature, in chain order, filled in place by
+    Simulation.get_state. The arrays are overwritten on the next refresh, so consumers that keep
+    data beyond the step they were handed it in must copy it (see copy)"""
+    __slots__ = ('frame', 't', 'positions', 'angles', 'voltages', 'fired')
+
+    def __init__(self, num_creatures: int):
+        self.frame = -1
+        self.t = 0.
+        self.positions = np.zeros((num_creatures, 2), dtype=np.float64)
+        self.angles = np.zeros(num_creatures, dtype=np.float64)
+        self.voltages = np.zeros(num_creatures, dtype=np.float64)
+        self.fired = np.zeros(num_creatures, dtype=np.bool_)
+
+    def refresh(self, simulation: 'Simulation'):
+        self.frame = simulation.frame_counter
+        self.t = simulation.t
+        for chain, start, stop in zip(simulation.creature_chains, simulation.offsets, simulation.offsets[1:]):
+            chain.get_positions(self.positions[start:stop])
+            chain.get_angles(self.angles[start:stop])
+            chain.get_voltages(self.voltages[start:stop])
+            swarm = getattr(chain, 'swarm', None)
+            self.fired[start:stop] = False if swarm is None else swarm.fired
+
+    def copy(self) -> 'StepState':
+        state = StepState.__new__(StepState)
+        state.frame, state.t = self.frame, self.t
+        state.positions, state.angles = self.positions.copy(), self.angles.copy()
+        state.voltages, state.fired = self.voltages.copy(), self.fired.copy()
+        return state
+
+
+@dataclass
+class Subscription:
+    """callback(state: StepState) called after every step whose frame is a multiple of every"""
+    callback: Callable[[StepState], None]
+    every: int = 1
+
+
+@dataclass
+class Checkpoint:
+    """Compressed snapshot of a whole Simulation (pymunk bodies and constraints, concentration space,
+    salp voltages and random streams), see Simulation.checkpoint"""
+    frame: int
+    t: float
+    data: bytes
+
+    def save(self, path: str):
+        with open(path, 'wb') as file:
+            pickle.dump(self, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> 'Checkpoint':
+        with open(path, 'rb') as file:
+            return pickle.load(file)
 
 
 class Simulation:
-    def __init__(self, creature_chain: CreatureChain, **kwargs):
-        self.creature_chain = creature_chain
+    """Steps one or more creature chains sharing a pymunk.Space and a ConcentrationSpace.
+
+    kwargs:
+        fps: int
+            fixed steps per simulated second
+        max_time: float
+            simulated seconds run by run()
+        seed: int
+            root of all random streams in the simulation, None draws fresh entropy. The seed in use is
+            always available as self.seed so that any run can be reproduced
+        self_collision: bool
+            whether salps of the same chain collide with each other. Linked neighbours never collide,
+            and chains always collide with other chains
+        spatial_hash_threshold: int
+            switch the space's broad phase from the bounding box tree to a spatial hash once it holds at
+            least this many shapes, None to keep the tree
+        physics_substeps: int
+            pymunk steps per frame. More substeps make stiff links stable without running more decisions
+        decision_rate: float
+            jet decisions per simulated second, must divide fps. None decides every frame
+        impulse_reference_rate: float
+            decision rate the thrust was tuned at. Impulses are scaled by impulse_reference_rate / decision_rate,
+            keeping the mean thrust per second when the decision rate changes. None leaves thrust unscaled"""
+    def __init__(self, creature_chain, **kwargs):
+        # a single chain or a sequence of chains built on the same spaces
+        if isinstance(creature_chain, CreatureChain):
+            creature_chain = [creature_chain]
+        self.creature_chains: List[CreatureChain] = list(creature_chain)
+        self.creature_chain = self.creature_chains[0]
 
         self.space = self.creature_chain.creature.physics_handler.space
         self.concentration_space = self.creature_chain.creature.concentration_handler.concentration_space
 
         self.fps = kwargs['fps']
         self.dt = 1 / self.fps
+        self.physics_substeps: int = kwargs.get('physics_substeps', 1)
+        if self.physics_substeps < 1:
+            raise ValueError("physics_substeps must be at least 1, got %s" % self.physics_substeps)
+        self.substep_dt = self.dt / self.physics_substeps
+        self.decision_interval: int = self.get_decision_interval(self.fps, kwargs.get('decision_rate'))
         self.max_time = kwargs['max_time']
+        self.frame_counter = 0
+        self.recorder = None
+        self.profiler: Profiler = None
+        self.subscriptions: List[Subscription] = []
+        # history kept by termination conditions, part of the state so it survives checkpoint and resume
+        self.termination_state: dict = {}
+
+        self.self_collision: bool = kwargs.get('self_collision', True)
+        self.spatial_hash_threshold: int = kwargs.get('spatial_hash_threshold', 1024)
+        if not self.self_collision:
+            for group, chain in enumerate(self.creature_chains, start=1):
+                chain.set_collision_group(group)
+        self.tune_space()
+        reference_rate = kwargs.get('impulse_reference_rate')
+        if reference_rate is not None:
+            for chain in self.creature_chains:
+                chain.set_impulse_scale(reference_rate / self.decision_rate)
+
+        # creature indices of each chain within the concatenated arrays of all chains
+        self.offsets: List[int] = [0]
+        for chain in self.creature_chains:
+            self.offsets.append(self.offsets[-1] + len(chain.creature_list))
+        self.edges: List[tuple] = [(a + offset, b + offset)
+                                   for chain, offset in zip(self.creature_chains, self.offsets)
+                                   for a, b in chain.edges]
+
+        self.state = StepState(self.num_creatures)
+
+        seed = kwargs.get('seed')
+        self.seed: int = np.random.SeedSequence().entropy if seed is None else seed
+        self.seed_sequence = np.random.SeedSequence(self.seed)
+        self.seed_chains(self.seed_sequence.spawn(1)[0])
+
+    def seed_chains(self, seed_sequence: np.random.SeedSequence):
+        """Gives every chain its own random streams spawned from seed_sequence"""
+        if len(self.creature_chains) == 1:
+            self.creature_chain.seed(seed_sequence)
+            return
+        for chain, child in zip(self.creature_chains, seed_sequence.spawn(len(self.creature_chains))):
+            chain.seed(child)
+
+    def tune_space(self):
+        """Uses a spatial hash sized to the salps for large spaces, the bounding box tree scales worse"""
+        radius = max(creature.radius for chain in self.creature_chains for creature in chain.creature_list)
+        self.configure_broad_phase(self.space, len(self.space.shapes), radius, self.spatial_hash_threshold)
+
+    @staticmethod
+    def configure_broad_phase(space, num_shapes: int, radius: float, spatial_hash_threshold: int = 1024):
+        """Switches space to a spatial hash if it will hold at least spatial_hash_threshold shapes.
+        Doing this before adding the shapes also avoids the bounding box tree's slow bulk insertion"""
+        if spatial_hash_threshold is None or num_shapes < spatial_hash_threshold:
+            return
+        space.use_spatial_hash(3 * radius, 2 * num_shapes)
+
+    @staticmethod
+    def get_decision_interval(fps: int, decision_rate: float = None) -> int:
+        """Frames between decisions"""
+        if decision_rate is None:
+            return 1
+        interval = fps / decision_rate
+        if interval < 1 - 1e-9 or abs(interval - round(interval)) > 1e-9:
+            raise ValueError("decision_rate %s does not divide fps %s" % (decision_rate, fps))
+        return int(round(interval))
+
+    @property
+    def decision_rate(self) -> float:
+        return self.fps / self.decision_interval
+
+    @property
+    def num_creatures(self) -> int:
+        return self.offsets[-1]
+
+    @property
+    def t(self) -> float:
+        return self.dt * self.frame_counter
+
+    def step(self):
+        """Advances the simulation by one fixed time step"""
+        if self.profiler is not None:
+            self._profiled_step()
+            return
+        decide = self.frame_counter % self.decision_interval == 0
+        for creature_chain in self.creature_chains:
+            if decide:
+                creature_chain.run_chain()
+            else:
+                creature_chain.idle()
+
+        self.frame_counter += 1
+        self.concentration_space.step(self.dt)
+        # impulses from the decision above are applied once, before the first substep
+        for _ in range(self.physics_substeps):
+            self.space.step(self.substep_dt)
+        if self.recorder is not None:
+            self.recorder.record(self)
+        if self.subscriptions:
+            self.notify()
+
+    def _profiled_step(self):
+        """step with every phase timed by self.profiler"""
+        profiler = self.profiler
+        step_start = profiler.start()
+        start = profiler.start()
+        decide = self.frame_counter % self.decision_interval == 0
+        for creature_chain in self.creature_chains:
+            if decide:
+                creature_chain.run_chain()
+            else:
+                creature_chain.idle()
+        profiler.stop('run_chain' if decide else 'idle', start)
+
+        self.frame_counter += 1
+        start = profiler.start()
+        self.concentration_space.step(self.dt)
+        profiler.stop('concentration_space.step', start)
+        start = profiler.start()
+        for _ in range(self.physics_substeps):
+            self.space.step(self.substep_dt)
+        profiler.stop('space.step', start)
+        profiler.count('constraints', self._num_constraints * self.physics_substeps)
+        if self.recorder is not None:
+            start = profiler.start()
+            self.recorder.record(self)
+            profiler.stop('record', start)
+        if self.subscriptions:
+            start = profiler.start()
+            self.notify()
+            profiler.stop('notify', start)
+        profiler.stop('step', step_start)
+        profiler.end_step(self.frame_counter)
+
+    def enable_profiling(self, timeline: bool = False) -> Profiler:
+        """Instruments every following step, see profiling.Profiler. Profiling costs nothing while disabled"""
+        self.profiler = Profiler(timeline=timeline)
+        for creature_chain in self.creature_chains:
+            creature_chain.profiler = self.profiler
+        self._num_constraints = len(self.space.constraints)
+        return self.profiler
+
+    def disable_profiling(self) -> Profiler:
+        profiler = self.profiler
+        self.profiler = None
+        for creature_chain in self.creature_chains:
+            creature_chain.profiler = None
+        return profiler
+
+    def attach_recorder(self, recorder):
+        """Records the state after every following step, e.g. with a recording.TrajectoryRecorder"""
+        recorder.open(self)
+        self.recorder = recorder
+
+    def detach_recorder(self):
+        """Flushes and closes the attached recorder"""
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
+    def get_state(self) -> StepState:
+        """self.state refreshed to the current step. Refreshes at most once per step, however many
+        consumers ask, and never allocates"""
+        if self.state.frame != self.frame_counter:
+            self.state.refresh(self)
+        return self.state
+
+    def subscribe(self, callback: Callable[[StepState], None], every: int = 1) -> Subscription:
+        """Calls callback with the shared StepState after every every-th step, from whichever loop drives
+        the simulation (run, stream or plain step calls). Steps no subscriber is due on read no state"""
+        if every < 1:
+            raise ValueError("every must be at least 1, got %s" % every)
+        subscription = Subscription(callback, every)
+        self.subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscriptions.remove(subscription)
+
+    def notify(self):
+        frame = self.frame_counter
+        for subscription in self.subscriptions:
+            if frame % subscription.every == 0:
+                subscription.callback(self.get_state())
+
+    def stream(self, every: int = 1, termination_conditions: List[TerminationCondition] = ()) -> Iterator[StepState]:
+        """Steps like run and yields the shared StepState after every every-th step. The same object is
+        yielded each time, copy it to keep it. Returns (as StopIteration.value) the termination condition
+        that ended the stream early, or None. Breaking out of the loop simply stops stepping"""
+        if every < 1:
+            raise ValueError("every must be at least 1, got %s" % every)
+        for condition in termination_conditions:
+            condition.reset(self)
+        while self.t < self.max_time:
+            self.step()
+            if self.frame_counter % every == 0:
+                yield self.get_state()
+            for condition in termination_conditions:
+                if condition(self):
+                    return condition
+        return None
+
+    def run(self, renderer=None, termination_conditions: List[TerminationCondition] = ()):
+        """Steps physics at the fixed rate as fast as possible until max_time.
+        If a renderer (e.g. rendering.ThreadedRenderer) is given, snapshots are handed to it whenever it is
+        ready for a new frame. The simulation never waits for it, frames are dropped instead.
+        Returns the termination condition that ended the run early, or None"""
+        for condition in termination_conditions:
+            condition.reset(self)
+        while self.t < self.max_time:
+            self.step()
+            if renderer is not None and renderer.ready():
+                start = None if self.profiler is None else self.profiler.start()
+                renderer.submit(self.snapshot())
+                if start is not None:
+                    self.profiler.stop('render_submit', start)
+            for condition in termination_conditions:
+                if condition(self):
+                    return condition
+        return None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # recorders hold open files and subscribers belong to their consumer, both stay with the original
+        state['recorder'] = None
+        state['subscriptions'] = []
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # pymunk does not pickle the choice of spatial index
+        self.tune_space()
+
+    def checkpoint(self) -> Checkpoint:
+        """Captures the full state so it can be restored or forked, in this process or another one"""
+        data = pickle.dumps(self, protocol=pickle.HIGHEST_PROTOCOL)
+        return Checkpoint(frame=self.frame_counter, t=self.t, data=zlib.compress(data))
+
+    @staticmethod
+    def restore(checkpoint: Checkpoint) -> 'Simulation':
+        """Returns a new, independent Simulation continuing exactly where checkpoint was taken"""
+        return pickle.loads(zlib.decompress(checkpoint.data))
+
+    @staticmethod
+    def fork(checkpoint: Checkpoint, num_copies: int, reseed: bool = True) -> List['Simulation']:
+        """Independent copies continuing from checkpoint. Set e.g. max_time on each before running them.
+        With reseed every copy gets its own random streams (spawned deterministically from the checkpoint's
+        seed), otherwise all copies replay the same random numbers"""
+        data = zlib.decompress(checkpoint.data)
+        copies = [pickle.loads(data) for _ in range(num_copies)]
+        if reseed:
+            for simulation, seed_sequence in zip(copies, copies[0].seed_sequence.spawn(num_copies)):
+                simulation.seed_chains(seed_sequence)
+        return copies
+
+    def snapshot(self) -> SimulationSnapshot:
+        concentration_handler = self.creature_chain.creature.concentration_handler
+        concentration_field = None
+        if hasattr(concentration_handler, 'copy_field'):
+            concentration_field = concentration_handler.copy_field()
+        return SimulationSnapshot(frame=self.frame_counter,
+                                  t=self.t,
+                                  positions=self.get_positions(),
+                                  radii=[creature.radius for chain in self.creature_chains
+                                         for creature in chain.creature_list],
+                                  edges=self.edges,
+                                  concentration_origin=tuple(self.concentration_space.origin),
+                                  concentration_t=self.concentration_space.t,
+                                  concentration_field=concentration_field)
+
+    def get_positions(self) -> np.ndarray:
+        """(num_creatures, 2) physics positions of all chains, in chain order"""
+        if len(self.creature_chains) == 1:
+            return self.creature_chain.get_positions()
+        return np.concatenate([chain.get_positions() for chain in self.creature_chains])
 
-    def run(self):
-        frame_counter = 0
-        t = 0
+    def get_angles(self) -> np.ndarray:
+        if len(self.creature_chains) == 1:
+            return self.creature_chain.get_angles()
+        return np.concatenate([chain.get_angles() for chain in self.creature_chains])
 
-        while t < self.max_time:
-            t = self.dt * frame_counter
-            self.creature_chain.run_chain()
+    def get_center(self):
+        """Mean of the chain centers"""
+        if len(self.creature_chains) == 1:
+            return self.creature_chain.get_center()
+        return sum((chain.get_center() for chain in self.creature_chains), Vec2d(0, 0)) / len(self.creature_chains)
 
-            frame_counter += 1
-            self.concentration_space.step(self.dt)
-            self.space.step(self.dt)
+    def get_fitness(self) -> float:
+        """Mean distance between the center of each chain and the concentration origin, lower is better"""
+        origin = self.concentration_space.origin
+        return sum((chain.get_center() - origin).length for chain in self.creature_chains) / len(self.creature_chains)
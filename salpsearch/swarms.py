@@ -0,0 +1,115 @@
+from itertools import chain
+from typing import List
+
+import numpy as np
+import pymunk
+
+from helpers import FastFunctions
+
+
+class SalpSwarm:
+    """Structure-of-arrays storage for the state of every salp in a CreatureChain.
+    Salps attached to a swarm are thin views over one index of these arrays, so a whole
+    chain can decide and update in a single kernel call.
+
+    arrays (one entry per salp):
+        voltage: float
+            current action potential
+        action_potential_baseline: float
+            voltage after firing
+        action_potential_step: float
+            voltage increase given zero concentration
+        thrust: float
+            magnitude of the impulse applied when firing, times impulse_scale
+        fired: bool
+            whether the salp fired on the last jet_decision
+
+    Random numbers come from the swarm's own Generator (see seed) and are drawn block_steps steps at a time.
+    """
+
+    def __init__(self, num_creatures: int, block_steps: int = 256):
+        self.num_creatures = num_creatures
+        self.block_steps = block_steps
+        self.rng = np.random.default_rng()
+        self._draws = np.empty((block_steps, num_creatures, 2), dtype=np.float64)
+        self._draw_index = block_steps
+        # generator state the current block was drawn from, so checkpoints can redraw it instead of storing it
+        self._block_state = None
+        self.voltage = np.zeros(num_creatures, dtype=np.float64)
+        self.action_potential_baseline = np.zeros(num_creatures, dtype=np.float64)
+        self.action_potential_step = np.zeros(num_creatures, dtype=np.float64)
+        self.thrust = np.zeros(num_creatures, dtype=np.float64)
+        # set by Simulation when decisions run at a different rate than thrust was tuned at
+        self.impulse_scale = 1.
+        self.fired = np.zeros(num_creatures, dtype=np.bool_)
+        # positions read for the last decision, reused every step
+        self.positions = np.zeros((num_creatures, 2), dtype=np.float64)
+        self.bodies: List[pymunk.Body] = [None] * num_creatures
+
+    def __len__(self):
+        return self.num_creatures
+
+    def seed(self, seed):
+        """Replaces the random stream, seed is anything numpy.random.default_rng accepts (e.g. a SeedSequence)"""
+        self.rng = np.random.default_rng(seed)
+        self._draw_index = self.block_steps
+
+    def next_draws(self) -> np.ndarray:
+        """(N, 2) uniform draws for one step, refilled from the generator one block at a time"""
+        if self._draw_index == self.block_steps:
+            self._block_state = self.rng.bit_generator.state
+            self.rng.random(out=self._draws)
+            self._draw_index = 0
+        draws = self._draws[self._draw_index]
+        self._draw_index += 1
+        return draws
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the block is incompressible random doubles, redrawn from _block_state on restore
+        del state['_draws']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._draws = np.empty((self.block_steps, self.num_creatures, 2), dtype=np.float64)
+        if self._draw_index < self.block_steps:
+            generator = np.random.Generator(getattr(np.random, self._block_state['bit_generator'])())
+            generator.bit_generator.state = self._block_state
+            generator.random(out=self._draws)
+
+    def get_positions(self, out: np.ndarray = None) -> np.ndarray:
+        """(N, 2) array of physics positions, written into out instead of a new array if given"""
+        coordinates = np.fromiter(chain.from_iterable(body.position for body in self.bodies), dtype=np.float64,
+                                  count=2 * self.num_creatures).reshape(self.num_creatures, 2)
+        if out is None:
+            return coordinates
+        # assigning through out itself, a reshaped view of a non-contiguous out would be a copy
+        out[:] = coordinates
+        return out
+
+    def get_angles(self, out: np.ndarray = None) -> np.ndarray:
+        angles = np.fromiter((body.angle for body in self.bodies), dtype=np.float64, count=self.num_creatures)
+        if out is None:
+            return angles
+        out[:] = angles
+        return out
+
+    def jet_decision(self, concentrations: np.ndarray):
+        """Draws every random number for the step at once, updates voltages in one kernel call
+        and only touches pymunk for the salps that fire"""
+        draws = self.next_draws()
+        FastFunctions.jet_decision_kernel(self.voltage, self.action_potential_baseline, self.action_potential_step,
+                                          concentrations, draws, self.fired)
+        self.apply_impulses(np.flatnonzero(self.fired))
+
+    def apply_impulses(self, firing: np.ndarray):
+        if len(firing) == 0:
+            return
+        # thrust is Vec2d(0, 1) rotated by the body angle, as in Salp.jet_decision
+        angles = np.array([self.bodies[i].angle for i in firing])
+        thrust = self.thrust[firing] * self.impulse_scale
+        impulse_x = -np.sin(angles) * thrust
+        impulse_y = np.cos(angles) * thrust
+        for i, x, y in zip(firing, impulse_x, impulse_y):
+            self.bodies[i].apply_impulse_at_local_point((x, y), (0, 0))
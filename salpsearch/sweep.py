@@ -0,0 +1,305 @@
+"""Runs parameter sweeps over the configs in conf/ on a local process pool and writes every outcome into
+one columnar results table.
+
+    python sweep.py --grid salp.creature.thrust=500,1000,1500 \\
+        salp_chain.creature_chain.creature_graph.num_creatures=4,8,16 --repeats 3 --output sweep.npz
+    python sweep.py --uniform salp.creature.action_potential_step=0.0001:0.001 --choice \\
+        salp_chain.creature_chain.link_handler.max=5,10,20 --samples 1000 --cache sweep.db --output sweep.csv
+
+Fields are dotted paths into the composed config (conf/config.yaml), --set takes Hydra overrides applied
+before sweeping, e.g. --set simulation.simulation.max_time=20 salp.creature.concentration_handler.type=...
+The config is composed once, every sweep point is applied to a plain copy of it and turned into a RunConfig,
+so no Hydra machinery runs per simulation. Run from the salpsearch directory.
+"""
+import argparse
+import copy
+import csv
+import itertools
+import math
+import os
+import sys
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, List, Sequence
+
+import numpy as np
+import yaml
+from hydra import compose, initialize_config_dir
+from omegaconf import OmegaConf
+
+from config import (RunConfig, SalpConfig, PhysicsHandlerConfig, PhysicsSpaceConfig, ConcentrationHandlerConfig,
+                    ConcentrationSpaceConfig, PinHandlerConfig, RotaryLimitHandlerConfig, DampedSpringConfig,
+                    SimulationConfig)
+from evaluation import EvaluationEngine, EvaluationTask
+from factories.simulation_factory import SimulationFactory
+from result_cache import ResultCache, canonical_hash
+
+CONF_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'conf')
+
+GRAPH_CONFIGS = {graph.__name__: config for config, graph in SimulationFactory.graphs.items()}
+LINK_HANDLER_CONFIGS = {'PinHandler': PinHandlerConfig,
+                        'RotaryLimitHandler': RotaryLimitHandlerConfig,
+                        'DampedSpringHandler': DampedSpringConfig}
+
+
+def compose_conf(overrides: Sequence[str] = (), conf_dir: str = CONF_DIR) -> dict:
+    """conf/config.yaml with Hydra overrides applied, as plain resolved python containers"""
+    with initialize_config_dir(config_dir=os.path.abspath(conf_dir), version_base=None):
+        return OmegaConf.to_container(compose(config_name='config', overrides=list(overrides)), resolve=True)
+
+
+def _tuples(node: dict) -> dict:
+    return {key: tuple(value) if isinstance(value, list) else value for key, value in node.items()
+            if key != '_target_'}
+
+
+def _target_name(node: dict) -> str:
+    return node['_target_'].rsplit('.', 1)[-1]
+
+
+def run_config_from_conf(conf: dict) -> RunConfig:
+    """Converts a composed config into the RunConfig that SimulationFactory builds simulations from"""
+    creature = conf['salp']['creature']
+    physics = creature['physics_handler']
+    concentration = creature['concentration_handler']
+    space = PhysicsSpaceConfig(space=physics['space'], damping=physics['damping'])
+    salp = SalpConfig(
+        physics_handler=PhysicsHandlerConfig(space=space, type=physics.get('type', 'SalpPhysicsHandler')),
+        concentration_handler=ConcentrationHandlerConfig(
+            space=ConcentrationSpaceConfig(origin=tuple(concentration['origin'])),
+            type=concentration['type'],
+            diffusion_coefficient=concentration['diffusion_coefficient'],
+            params=dict(concentration.get('params') or {})),
+        pos=tuple(creature['pos']),
+        radius=creature['radius'],
+        thrust=creature['thrust'],
+        action_potential_baseline=creature['action_potential_baseline'],
+        action_potential_step=creature['action_potential_step'],
+        angle=creature['angle'])
+
+    chain = conf['salp_chain']['creature_chain']
+    graph, link = chain['creature_graph'], chain['link_handler']
+    if _target_name(graph) not in GRAPH_CONFIGS:
+        raise ValueError("Unknown creature graph %s" % graph['_target_'])
+    if _target_name(link) not in LINK_HANDLER_CONFIGS:
+        raise ValueError("Unknown link handler %s" % link['_target_'])
+    return RunConfig(salp=salp,
+                     creature_graph=GRAPH_CONFIGS[_target_name(graph)](**_tuples(graph)),
+                     link_handler=LINK_HANDLER_CONFIGS[_target_name(link)](space=space, **_tuples(link)),
+                     simulation=SimulationConfig(**_tuples(conf['simulation']['simulation'])))
+
+
+def set_path(conf: dict, path: str, value):
+    """Sets the dotted path in conf. Every key has to exist already, except inside a handler's free-form params"""
+    *parents, last = path.split('.')
+    node = conf
+    for key in parents:
+        if not isinstance(node, dict) or key not in node:
+            raise KeyError("%s is not a config field" % path)
+        node = node[key]
+    if not isinstance(node, dict) or (last not in node and parents[-1:] != ['params']):
+        raise KeyError("%s is not a config field" % path)
+    node[last] = value
+
+
+# Sweep points
+@dataclass
+class Uniform:
+    """Samples uniformly from [low, high], or log-uniformly if log. Integer bounds give integers"""
+    low: float
+    high: float
+    log: bool = False
+
+    def sample(self, rng: np.random.Generator, n: int) -> list:
+        if self.log:
+            values = np.exp(rng.uniform(math.log(self.low), math.log(self.high), n))
+        else:
+            values = rng.uniform(self.low, self.high, n)
+        if isinstance(self.low, int) and isinstance(self.high, int):
+            return np.clip(np.rint(values), self.low, self.high).astype(int).tolist()
+        return values.tolist()
+
+
+def grid_points(axes: Dict[str, Sequence]) -> List[dict]:
+    """Every combination of the values of axes, the last axis varying fastest"""
+    paths = list(axes)
+    return [dict(zip(paths, values)) for values in itertools.product(*(axes[path] for path in paths))]
+
+
+def random_points(distributions: Dict[str, object], samples: int, seed: int = 0) -> List[dict]:
+    """samples points with every path drawn independently, from a Uniform or uniformly from a list of choices"""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for path, distribution in distributions.items():
+        if isinstance(distribution, Uniform):
+            columns[path] = distribution.sample(rng, samples)
+        else:
+            choices = list(distribution)
+            columns[path] = [choices[i] for i in rng.integers(len(choices), size=samples)]
+    return [{path: columns[path][i] for path in distributions} for i in range(samples)]
+
+
+class ProgressReporter:
+    """Prints finished / total runs with throughput and remaining time, at most every interval seconds"""
+
+    def __init__(self, stream=sys.stderr, interval: float = 0.5):
+        self.stream = stream
+        self.interval = interval
+        self.start = time.perf_counter()
+        self.last = -math.inf
+        self.first_finished = None
+
+    def __call__(self, finished: int, total: int):
+        now = time.perf_counter()
+        if self.first_finished is None:
+            # cached runs are done before anything starts and would inflate the rate
+            self.first_finished = finished
+            self.start = now
+        if now - self.last < self.interval and finished < total:
+            return
+        self.last = now
+        elapsed = now - self.start
+        computed = finished - self.first_finished
+        rate = computed / elapsed if elapsed > 0 else 0.
+        remaining = (total - finished) / rate if rate > 0 else math.inf
+        self.stream.write('\r[%*d/%d] %.1f runs/s, %s left ' % (len(str(total)), finished, total, rate,
+                                                                '?' if math.isinf(remaining) else '%.0f s' % remaining))
+        if finished == total:
+            self.stream.write('in %.1f s\n' % elapsed)
+        self.stream.flush()
+
+
+class SweepRunner:
+    """Runs every sweep point repeats times on an EvaluationEngine and collects the outcomes column-wise.
+
+    kwargs:
+        engine: EvaluationEngine
+            runs the simulations, give it a seed (and a cache) to make a sweep resumable
+        base_conf: dict
+            composed config the points are applied to, see compose_conf
+        repeats: int
+            runs per point, each with its own seed
+    """
+
+    def __init__(self, engine: EvaluationEngine, base_conf: dict = None, repeats: int = 1):
+        self.engine = engine
+        self.base_conf = compose_conf() if base_conf is None else base_conf
+        self.repeats = repeats
+
+    def make_configs(self, points: Sequence[dict]) -> List[RunConfig]:
+        configs = []
+        for point in points:
+            conf = copy.deepcopy(self.base_conf)
+            for path, value in point.items():
+                set_path(conf, path, value)
+            config = run_config_from_conf(conf)
+            for repeat in range(self.repeats):
+                seed = self.run_seed(point, repeat)
+                configs.append(replace(config, simulation=replace(config.simulation, seed=seed)))
+        return configs
+
+    def run_seed(self, point: dict, repeat: int) -> int:
+        """Seed of one run, derived from the engine's seed, the point's values and the repeat index only. Every
+        repeat gets its own seed even if the base config fixes one, and adding points to a sweep leaves the
+        seeds (and cached results) of the others unchanged"""
+        seed_sequence = np.random.SeedSequence([self.engine.seed, canonical_hash(point), repeat])
+        return int(seed_sequence.generate_state(1, np.uint64)[0])
+
+    def run(self, points: Sequence[dict], progress=None) -> Dict[str, np.ndarray]:
+        """One column per swept path, plus point, repeat, seed, fitness, t and terminated, one row per run"""
+        configs = self.make_configs(points)
+        results = self.engine.run_tasks([EvaluationTask(config) for config in configs], progress=progress)
+
+        rows = [point for point in points for _ in range(self.repeats)]
+        columns = {'point': np.repeat(np.arange(len(points)), self.repeats),
+                   'repeat': np.tile(np.arange(self.repeats), len(points))}
+        for path in dict.fromkeys(path for point in points for path in point):
+            columns[path] = _column([row.get(path) for row in rows])
+        columns['seed'] = np.array([config.simulation.seed for config in configs], dtype=np.uint64)
+        columns['fitness'] = np.array([result.fitness for result in results], dtype=np.float64)
+        columns['t'] = np.array([result.t for result in results], dtype=np.float64)
+        columns['terminated'] = np.array([result.terminated for result in results], dtype=bool)
+        return columns
+
+
+def _column(values: list) -> np.ndarray:
+    if all(isinstance(value, (bool, int, float)) for value in values):
+        return np.asarray(values)
+    # lists, strings and missing values are kept as their YAML text
+    return np.array([yaml.safe_dump(value, default_flow_style=True).strip().removesuffix('...').strip()
+                     for value in values])
+
+
+def write_results(path: str, columns: Dict[str, np.ndarray]):
+    """.csv writes a text table, anything else an .npz archive with one array per column"""
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(list(columns))
+            writer.writerows(zip(*(column.tolist() for column in columns.values())))
+    else:
+        np.savez(path, **columns)
+
+
+def _parse_axis(argument: str):
+    path, separator, values = argument.partition('=')
+    if not separator:
+        raise argparse.ArgumentTypeError("%s is not of the form path=values" % argument)
+    return path, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--grid', nargs='+', type=_parse_axis, default=[], metavar='PATH=V1,V2',
+                        help='grid axes, every combination of their values is run')
+    parser.add_argument('--uniform', nargs='+', type=_parse_axis, default=[], metavar='PATH=LOW:HIGH',
+                        help='randomly sampled fields, integers if both bounds are')
+    parser.add_argument('--log-uniform', nargs='+', type=_parse_axis, default=[], metavar='PATH=LOW:HIGH')
+    parser.add_argument('--choice', nargs='+', type=_parse_axis, default=[], metavar='PATH=V1,V2',
+                        help='randomly sampled fields, drawn from the given values')
+    parser.add_argument('--samples', type=int, default=0,
+                        help='number of random points, each is combined with every grid point')
+    parser.add_argument('--set', nargs='+', default=[], metavar='OVERRIDE', help='Hydra overrides of the base config')
+    parser.add_argument('--conf-dir', default=CONF_DIR)
+    parser.add_argument('--repeats', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunksize', type=int, default=1)
+    parser.add_argument('--timeout', type=float, default=None, help='wall time limit per run in seconds')
+    parser.add_argument('--seed', type=int, default=0, help='seeds the random points and the runs')
+    parser.add_argument('--cache', default=None, help='SQLite result cache, reruns skip every cached run')
+    parser.add_argument('--output', default='sweep.npz', help='.npz or .csv results table')
+    args = parser.parse_args()
+
+    def values(text):
+        # YAML flow syntax, so 1,2 are two numbers and [1, 2],[3, 4] two lists
+        return yaml.safe_load('[%s]' % text)
+
+    distributions = {}
+    for path, text in args.uniform:
+        distributions[path] = Uniform(*values(text.replace(':', ',')))
+    for path, text in args.log_uniform:
+        distributions[path] = Uniform(*values(text.replace(':', ',')), log=True)
+    for path, text in args.choice:
+        distributions[path] = values(text)
+    if distributions and args.samples <= 0:
+        parser.error('random fields need --samples')
+
+    points = grid_points({path: values(text) for path, text in args.grid})
+    if distributions:
+        samples = random_points(distributions, args.samples, args.seed)
+        points = [{**grid_point, **random_point} for grid_point in points for random_point in samples]
+
+    cache = None if args.cache is None else ResultCache(args.cache)
+    engine = EvaluationEngine(num_workers=args.workers, chunksize=args.chunksize, timeout=args.timeout,
+                              seed=args.seed, cache=cache)
+    runner = SweepRunner(engine, compose_conf(args.set, args.conf_dir), repeats=args.repeats)
+    columns = runner.run(points, progress=ProgressReporter())
+    write_results(args.output, columns)
+
+    finished = ~np.isnan(columns['t'])
+    print('%d runs, %d timed out, best fitness %.3f, written to %s'
+          % (len(columns['fitness']), np.count_nonzero(~finished), np.min(columns['fitness']), args.output))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Tuple
+
+
+class TerminationCondition(ABC):
+    """Checked by Simulation.run after every step, the run stops as soon as one returns True"""
+
+    def reset(self, simulation):
+        """Called once when a run starts or resumes. Conditions are shared between runs, so any history
+        they need across steps belongs in simulation.termination_state, which is checkpointed with the run"""
+        pass
+
+    @abstractmethod
+    def __call__(self, simulation) -> bool:
+        raise NotImplementedError
+
+
+class ReachedTarget(TerminationCondition):
+    """Stops once the chain centers are on average within radius of the concentration origin"""
+
+    def __init__(self, radius: float = 20):
+        self.radius = radius
+
+    def __call__(self, simulation) -> bool:
+        return simulation.get_fitness() <= self.radius
+
+
+class LeftDomain(TerminationCondition):
+    """Stops once the mean of the chain centers leaves bounds, given as (x_min, y_min, x_max, y_max)
+    in physics coordinates"""
+
+    def __init__(self, bounds: Tuple[float, float, float, float] = (0, 0, 800, 800)):
+        self.bounds = bounds
+
+    def __call__(self, simulation) -> bool:
+        x, y = simulation.get_center()
+        x_min, y_min, x_max, y_max = self.bounds
+        return not (x_min <= x <= x_max and y_min <= y <= y_max)
+
+
+class Stalled(TerminationCondition):
+    """Stops when the distance to the concentration origin has shrunk by less than min_progress
+    over the last window seconds of simulated time. The distances are kept in the simulation, so a run
+    resumed from a checkpoint still sees the progress it made before"""
+
+    def __init__(self, window: float = 5, min_progress: float = 5):
+        self.window = window
+        self.min_progress = min_progress
+        self.distances = deque()
+
+    def reset(self, simulation):
+        key = (type(self).__name__, self.window, self.min_progress)
+        maxlen = max(1, int(round(self.window / simulation.dt))) + 1
+        distances = simulation.termination_state.get(key)
+        if distances is None or distances.maxlen != maxlen:
+            distances = simulation.termination_state[key] = deque(maxlen=maxlen)
+        self.distances = distances
+
+    def __call__(self, simulation) -> bool:
+        self.distances.append(simulation.get_fitness())
+        if len(self.distances) < self.distances.maxlen:
+            return False
+        return self.distances[0] - self.distances[-1] < self.min_progress
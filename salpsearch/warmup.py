@@ -0,0 +1,28 @@
+"""Prebuilds numba's on-disk cache for the simulation kernels, so pool workers and short runs load
+compiled code instead of compiling it.
+
+    python warmup.py
+    python warmup.py --kernels ficks_many jet_decision_kernel
+
+Run from the salpsearch directory, once per checkout and whenever the kernels or numba change.
+The cache lives in __pycache__ next to helpers.py, or under NUMBA_CACHE_DIR if that is set.
+"""
+import argparse
+
+from helpers import WARM_UP_CALLS, warm_up
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--kernels', nargs='+', choices=sorted(WARM_UP_CALLS), default=None,
+                        help='kernels to compile, all by default')
+    args = parser.parse_args()
+
+    seconds = warm_up(args.kernels)
+    for name, elapsed in seconds.items():
+        print('%-28s %8.3f s' % (name, elapsed))
+    print('%-28s %8.3f s' % ('total', sum(seconds.values())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+# salpsearch modules import each other by flat name, as when run from the salpsearch directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'salpsearch'))
+
+
+@pytest.fixture
+def make_config():
+    """Builds the RunConfig of a linear chain heading for a Fick's source, simulation fields overridable"""
+    from config import (ConcentrationHandlerConfig, ConcentrationSpaceConfig, LinearChainConfig,
+                        PhysicsHandlerConfig, PhysicsSpaceConfig, RotaryLimitHandlerConfig, RunConfig, SalpConfig,
+                        SimulationConfig)
+
+    def make(num_creatures: int = 16, concentration_handler: str = 'FicksConcentrationHandler', **simulation):
+        simulation = {'fps': 15, 'max_time': 100., 'seed': 7, **simulation}
+        return RunConfig(
+            salp=SalpConfig(physics_handler=PhysicsHandlerConfig(PhysicsSpaceConfig('physics_space', 0.8)),
+                            concentration_handler=ConcentrationHandlerConfig(ConcentrationSpaceConfig((300, 500)),
+                                                                             concentration_handler),
+                            pos=(400, 400), radius=5, thrust=1000, action_potential_baseline=0.0001,
+                            action_potential_step=0.0003, angle=0),
+            creature_graph=LinearChainConfig(num_creatures, (400, 400), (-1, 1), 15),
+            link_handler=RotaryLimitHandlerConfig(PhysicsSpaceConfig('physics_space', 0.8), -10, 10),
+            simulation=SimulationConfig(**simulation))
+
+    return make
+
+
+@pytest.fixture
+def make_simulation(make_config):
+    from factories.simulation_factory import SimulationFactory
+    return lambda *args, **kwargs: SimulationFactory().make_simulation(make_config(*args, **kwargs))
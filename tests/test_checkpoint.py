@@ -0,0 +1,25 @@
+import numpy as np
+
+from simulation import Simulation
+
+
+def state(simulation):
+    return simulation.get_positions(), np.concatenate([chain.swarm.voltage for chain in simulation.creature_chains])
+
+
+def test_restore_continues_bit_identically(make_simulation):
+    simulation = make_simulation()
+    # stop part way through a block of random draws, which restore has to redraw
+    for _ in range(100):
+        simulation.step()
+    checkpoint = simulation.checkpoint()
+    restored = Simulation.restore(checkpoint)
+
+    for _ in range(300):
+        simulation.step()
+        restored.step()
+    positions, voltages = state(simulation)
+    restored_positions, restored_voltages = state(restored)
+    np.testing.assert_array_equal(restored_positions, positions)
+    np.testing.assert_array_equal(restored_voltages, voltages)
+    assert restored.frame_counter == simulation.frame_counter
@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from pymunk import Vec2d
+
+from handlers import ConcentrationHandler, ConcentrationSpace, FicksConcentrationHandler
+
+
+@pytest.mark.parametrize('t', [0., 0.5, 3., 60.])
+def test_ficks_get_conc_many_matches_scalar_path(t):
+    space = ConcentrationSpace((300, 500))
+    space.t = t
+    handler = FicksConcentrationHandler(space, D=0.002)
+    positions = np.random.default_rng(0).uniform(0, 800, (200, 2))
+    positions[0] = space.origin
+
+    expected = [handler.get_conc(Vec2d(x, y)) for x, y in positions]
+    np.testing.assert_array_equal(handler.get_conc_many(positions), expected)
+
+
+def test_default_get_conc_many_falls_back_to_get_conc():
+    class Distance(ConcentrationHandler):
+        def get_conc(self, pos):
+            return int(pos.x + 2 * pos.y)
+
+    handler = Distance(ConcentrationSpace((0, 0)))
+    positions = np.array([[1., 2.], [3., 4.]])
+    np.testing.assert_array_equal(handler.get_conc_many(positions), [5, 11])
@@ -0,0 +1,52 @@
+import numpy as np
+import pymunk
+import pytest
+
+from simulation import Simulation
+from swarms import SalpSwarm
+
+
+def test_impulses_scale_with_the_decision_rate(make_simulation):
+    simulation = make_simulation(fps=60, decision_rate=15, impulse_reference_rate=60)
+    assert simulation.decision_interval == 4
+    # a quarter of the decisions, each four times the impulse, keeps the mean thrust per second
+    assert simulation.creature_chain.swarm.impulse_scale == 4
+    assert make_simulation(fps=60, decision_rate=15).creature_chain.swarm.impulse_scale == 1
+
+
+def test_apply_impulses_uses_the_scale():
+    swarm = SalpSwarm(2)
+    for i in range(2):
+        swarm.bodies[i] = pymunk.Body(1, 1)
+    swarm.thrust[:] = (10, 20)
+    swarm.impulse_scale = 3
+    swarm.apply_impulses(np.array([0, 1]))
+    np.testing.assert_allclose(tuple(swarm.bodies[0].velocity), (0, 30), atol=1e-9)
+    np.testing.assert_allclose(tuple(swarm.bodies[1].velocity), (0, 60), atol=1e-9)
+
+
+def test_decisions_run_every_decision_interval_and_physics_every_substep(make_simulation, monkeypatch):
+    simulation = make_simulation(fps=60, decision_rate=15, physics_substeps=3)
+    chain = simulation.creature_chain
+    decisions, substeps = [], []
+    run_chain = chain.run_chain
+    monkeypatch.setattr(chain, 'run_chain', lambda: (decisions.append(simulation.frame_counter), run_chain()))
+    space_step = simulation.space.step
+    monkeypatch.setattr(simulation.space, 'step', lambda dt: (substeps.append(dt), space_step(dt)))
+
+    for _ in range(12):
+        simulation.step()
+        if simulation.frame_counter % 4 != 1:
+            assert not chain.swarm.fired.any()
+    assert decisions == [0, 4, 8]
+    assert len(substeps) == 36
+    np.testing.assert_allclose(substeps, 1 / 180)
+
+
+def test_decision_rate_must_divide_fps():
+    assert Simulation.get_decision_interval(60, None) == 1
+    assert Simulation.get_decision_interval(60, 20) == 3
+    with pytest.raises(ValueError):
+        Simulation.get_decision_interval(60, 25)
+    with pytest.raises(ValueError):
+        Simulation.get_decision_interval(60, 120)
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from graphs import BranchedChain, CreatureGraph, GridLattice, LinearChain, RandomGraph, RingChain
+
+LAYOUT = {'starting_point': (400, 400), 'direction_vector': (0, 1), 'distance': 15}
+
+
+class EdgeList(CreatureGraph):
+    def __init__(self, num_creatures, edges):
+        super().__init__()
+        self.num_creatures = num_creatures
+        self._edges = edges
+
+    def build_edges(self):
+        return self._edges
+
+    def build_positions(self):
+        return np.zeros((self.num_creatures, 2))
+
+
+def test_edges_are_deduplicated_with_the_lower_index_first():
+    graph = EdgeList(5, [(3, 1), (1, 3), (0, 4), (2, 2), (4, 0), (1, 3), (0, 1)])
+    np.testing.assert_array_equal(graph.edges, [[0, 1], [0, 4], [1, 3]])
+    assert graph.graph == {0: [1, 4], 1: [3], 2: [], 3: [], 4: []}
+
+
+def test_two_salp_ring_has_a_single_link():
+    np.testing.assert_array_equal(RingChain(num_creatures=2, **LAYOUT).edges, [[0, 1]])
+
+
+@pytest.mark.parametrize('graph', [
+    LinearChain(num_creatures=7, **LAYOUT),
+    RingChain(num_creatures=9, **LAYOUT),
+    BranchedChain(num_branches=4, branch_length=3, **LAYOUT),
+    GridLattice(rows=4, columns=5, **LAYOUT),
+    RandomGraph(num_creatures=60, link_probability=0.7, seed=3, **LAYOUT),
+])
+def test_csr_adjacency_matches_the_edge_list(graph):
+    adjacency = {i: set() for i in range(graph.num_creatures)}
+    for i, j in graph.edges:
+        adjacency[i].add(j)
+        adjacency[j].add(i)
+
+    assert graph.indptr[0] == 0 and graph.indptr[-1] == 2 * len(graph.edges)
+    for i in range(graph.num_creatures):
+        neighbours = graph.neighbours(i)
+        assert len(neighbours) == len(adjacency[i])
+        assert set(neighbours.tolist()) == adjacency[i]
+    np.testing.assert_array_equal(graph.degrees, [len(adjacency[i]) for i in range(graph.num_creatures)])
+    assert graph.positions.shape == (graph.num_creatures, 2)
+
+
+def test_topology_sizes():
+    assert len(LinearChain(num_creatures=7, **LAYOUT).edges) == 6
+    assert len(RingChain(num_creatures=9, **LAYOUT).edges) == 9
+    assert len(BranchedChain(num_branches=4, branch_length=3, **LAYOUT).edges) == 12
+    assert len(GridLattice(rows=4, columns=5, **LAYOUT).edges) == 4 * 4 + 3 * 5
+
+
+def test_random_graph_links_every_close_pair_when_certain():
+    graph = RandomGraph(num_creatures=100, link_probability=1., seed=1, **LAYOUT)
+    distances = np.linalg.norm(graph.positions[:, None] - graph.positions[None, :], axis=-1)
+    close = np.argwhere(np.triu(distances <= graph.link_distance, k=1))
+    np.testing.assert_array_equal(graph.edges, close)
+
+
+def test_branched_chain_needs_a_non_empty_branch():
+    with pytest.raises(ValueError):
+        BranchedChain(num_branches=3, branch_length=0, **LAYOUT)
@@ -0,0 +1,54 @@
+import numpy as np
+import pymunk
+
+from creatures import Salp
+from helpers import FastFunctions
+from swarms import SalpSwarm
+
+
+class FixedDraws:
+    """Stands in for a swarm's Generator, handing out the given draws in order"""
+
+    def __init__(self, draws):
+        self.draws = list(draws)
+
+    def random(self):
+        return self.draws.pop(0)
+
+
+def make_salp(voltage: float, baseline: float, step: float) -> Salp:
+    swarm = SalpSwarm(1)
+    salp = Salp.from_body(pymunk.Body(1, 1), physics_handler=None, concentration_handler=None, radius=5,
+                          swarm=swarm, index=0)
+    salp.voltage = voltage
+    salp.action_potential_baseline = baseline
+    salp.action_potential_step = step
+    salp.thrust = 1000
+    return salp
+
+
+def test_kernel_matches_salp_jet_decision():
+    rng = np.random.default_rng(0)
+    n = 500
+    voltage = rng.uniform(0, 0.5, n)
+    baseline = rng.uniform(0, 0.01, n)
+    step = rng.uniform(0, 0.01, n)
+    concentrations = rng.integers(0, 400, n).astype(np.float64)
+    draws = rng.uniform(0, 0.5, (n, 2))
+
+    kernel_voltage = voltage.copy()
+    fired = np.zeros(n, dtype=np.bool_)
+    FastFunctions.jet_decision_kernel(kernel_voltage, baseline, step, concentrations, draws, fired)
+
+    for i in range(n):
+        salp = make_salp(voltage[i], baseline[i], step[i])
+        # the second draw is only taken when the first one does not fire
+        salp.swarm.rng = FixedDraws(draws[i])
+        salp.jet_decision(concentrations[i])
+        assert (salp.body.velocity.length > 0) == fired[i]
+        assert np.isclose(salp.voltage, kernel_voltage[i], rtol=1e-12, atol=0)
+
+    # every branch of the decision is covered by these draws
+    assert np.any(draws[:, 0] < voltage)
+    assert np.any((draws[:, 0] >= voltage) & (draws[:, 1] < voltage))
+    assert np.any(~fired)
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+import metrics
+
+
+def test_path_metrics_of_a_straight_walk():
+    centroid_positions = np.stack((np.arange(11.), np.zeros(11)), axis=1)
+    assert metrics.path_lengths(centroid_positions) == pytest.approx(10)
+    assert metrics.path_efficiency(centroid_positions) == pytest.approx(1)
+    # towards a source ahead of the walk, then away from one behind it
+    assert metrics.path_efficiency(centroid_positions, (20, 0)) == pytest.approx(1)
+    assert metrics.path_efficiency(centroid_positions, (-5, 0)) == pytest.approx(-1)
+    assert metrics.path_efficiency(np.zeros((5, 2))) == 0
+
+    distances = metrics.distance_curves(centroid_positions, (10, 0))
+    np.testing.assert_allclose(distances, 10 - np.arange(11.))
+    times = np.arange(11) * 0.5
+    assert metrics.time_to_target(distances, times, radius=3) == pytest.approx(3.5)
+    assert metrics.time_to_target(distances, times, radius=-1) == np.inf
+
+
+def test_centroids_per_group_and_per_chain():
+    positions = np.array([[[0., 0.], [2., 0.], [10., 10.], [10., 12.], [10., 14.]]])
+    np.testing.assert_allclose(metrics.centroids(positions), [[6.4, 7.2]])
+    np.testing.assert_allclose(metrics.chain_centroids(positions, [0, 2, 5]), [[[1., 0.], [10., 12.]]])
+
+
+def test_shape_metrics():
+    line = np.stack((np.arange(5.), 2 * np.arange(5.)), axis=1)[None]
+    square = np.array([[[0., 0.], [1., 0.], [0., 1.], [1., 1.]]])
+    np.testing.assert_allclose(metrics.elongation(line), [1])
+    np.testing.assert_allclose(metrics.elongation(square), [0], atol=1e-12)
+    np.testing.assert_allclose(metrics.radius_of_gyration(square), [np.sqrt(0.5)])
+    np.testing.assert_allclose(metrics.radius_of_gyration(line),
+                               [np.sqrt(np.mean(np.sum((line[0] - line[0].mean(axis=0)) ** 2, axis=1)))])
+
+
+def test_firing_statistics():
+    dt = 0.1
+    rng = np.random.default_rng(0)
+    together = np.repeat(rng.random((4000, 1)) < 0.3, 8, axis=1)
+    independent = rng.random((4000, 8)) < 0.3
+    np.testing.assert_allclose(metrics.firing_rates(together, dt), together.mean(axis=0) / dt)
+    assert metrics.firing_statistics(together, dt)['synchrony'] == pytest.approx(8)
+    assert metrics.firing_statistics(together, dt)['rate_spread'] == pytest.approx(0)
+    assert metrics.firing_statistics(independent, dt)['synchrony'] == pytest.approx(1, abs=0.15)
+    assert metrics.firing_statistics(independent, dt)['mean_rate'] == pytest.approx(3, abs=0.1)
+
+
+def test_summarize_is_vectorized_over_runs():
+    rng = np.random.default_rng(1)
+    positions = rng.normal(400, 30, (3, 50, 6, 2))
+    fired = rng.random((3, 50, 6)) < 0.2
+    times = np.arange(1, 51) / 15
+    sources = np.array([[300, 500], [100, 100], [400, 400]])
+    batched = metrics.summarize(positions, fired, times, sources)
+    for run in range(3):
+        single = metrics.summarize(positions[run], fired[run], times, sources[run])
+        for name, value in single.items():
+            assert batched[name][run] == pytest.approx(value), name
+
+
+def test_collector_matches_summarize(make_simulation):
+    simulation = make_simulation(num_creatures=6)
+    collector = metrics.MetricsCollector(simulation)
+    with pytest.raises(ValueError):
+        collector.summary()
+
+    positions, fired, times = [], [], []
+    for state in simulation.stream():
+        positions.append(state.positions.copy())
+        fired.append(state.fired.copy())
+        times.append(state.t)
+        if len(times) == 60:
+            break
+    collector.close()
+
+    expected = metrics.summarize(np.array(positions), np.array(fired), np.array(times),
+                                 simulation.concentration_space.origin)
+    summary = collector.summary()
+    assert summary.keys() == expected.keys()
+    for name, value in expected.items():
+        assert summary[name] == pytest.approx(float(value)), name
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from pymunk import Vec2d
+
+from handlers import ConcentrationSpace, FicksConcentrationHandler, MultiSourceConcentrationHandler
+
+
+def brute_force(handler, positions, t):
+    """Per point and released source contributions, with nothing culled, and the source distances"""
+    points = positions / handler.disp
+    active = handler.source_release < t
+    squared = np.sum((points[:, None, :] - handler.source_positions[None, active, :]) ** 2, axis=-1)
+    dt4 = 4 * handler.source_D[active] * (t - handler.source_release[active])
+    return handler.source_amount[active] / np.sqrt(3.14 * dt4) * np.exp(-squared / dt4), np.sqrt(squared)
+
+
+@pytest.mark.parametrize('t', [0.5, 2., 5., 20.])
+def test_culling_only_drops_sources_beyond_the_cutoff(t):
+    rng = np.random.default_rng(0)
+    sources = [{'position': tuple(rng.uniform(0, 800, 2)), 'release_time': float(rng.uniform(0, 3)),
+                'amount': float(rng.uniform(20, 80))} for _ in range(300)]
+    space = ConcentrationSpace((300, 500))
+    space.t = t
+    handler = MultiSourceConcentrationHandler(space, D=0.002, sources=sources, cell_size=40, tolerance=0.5)
+    positions = rng.uniform(0, 800, (500, 2))
+
+    contributions, distances = brute_force(handler, positions, t)
+    culled = handler.get_conc_many(positions)
+    near = distances <= handler.cutoff_radius(t)
+    # sources past the cutoff add less than tolerance each, the ones within it are all summed
+    assert np.all(contributions[~near] < handler.tolerance)
+    assert np.all(culled >= np.floor(np.sum(contributions * near, axis=1)))
+    assert np.all(culled <= np.sum(contributions, axis=1))
+
+
+def test_nothing_before_release():
+    space = ConcentrationSpace((300, 500))
+    handler = MultiSourceConcentrationHandler(space, sources=[{'position': (300, 500), 'release_time': 1.}])
+    np.testing.assert_array_equal(handler.get_conc_many(np.array([[300., 500.], [0., 0.]])), [0, 0])
+
+
+def test_single_source_matches_ficks():
+    space = ConcentrationSpace((300, 500))
+    space.t = 4.
+    multi = MultiSourceConcentrationHandler(space, D=0.002, sources=[{'position': (300, 500)}], tolerance=1e-9)
+    ficks = FicksConcentrationHandler(space, D=0.002)
+    positions = np.random.default_rng(1).uniform(0, 800, (200, 2))
+    np.testing.assert_allclose(multi.get_conc_many(positions), ficks.get_conc_many(positions), atol=1)
+    assert multi.get_conc(Vec2d(300, 500)) == multi.get_conc_many(np.array([[300., 500.]]))[0]
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from helpers import ConcentrationRasterizer, FastFunctions
+
+
+@pytest.mark.parametrize('downsample', [1, 3])
+def test_rasterizer_matches_ficks_per_pixel(downsample):
+    rows, columns = 50, 40
+    origin, t, D = (0.3, 0.6), 2., 0.002
+    rasterizer = ConcentrationRasterizer((rows, columns), downsample)
+    image = rasterizer.render(origin, t, D)
+
+    expected = np.empty((rows, columns), dtype=np.int64)
+    for i in range(rows):
+        for j in range(columns):
+            # every pixel repeats the value at the top left of its downsample block
+            point = ((i - i % downsample) / rows, (j - j % downsample) / columns)
+            expected[i, j] = max(255 - FastFunctions.ficks(point, origin, t, D), 0)
+    assert image is rasterizer.buffer
+    assert np.all(image[:, :, 0] == image[:, :, 2])
+    # the separable product may round to the other side of an integer than the direct exp
+    np.testing.assert_allclose(image[:, :, 0], expected, atol=1)
@@ -0,0 +1,33 @@
+import numpy as np
+
+from recording import TrajectoryReader, TrajectoryRecorder
+
+
+def test_recording_round_trip(make_simulation, tmp_path):
+    simulation = make_simulation(num_creatures=6)
+    # a chunk size that does not divide the number of steps exercises both full and partial flushes
+    simulation.attach_recorder(TrajectoryRecorder(str(tmp_path), chunk_steps=7, metadata={'run': 'test'}))
+    expected = {'frames': [], 'positions': [], 'angles': [], 'voltages': [], 'fired': []}
+    for _ in range(30):
+        simulation.step()
+        expected['frames'].append(simulation.frame_counter)
+        expected['positions'].append(simulation.get_positions())
+        expected['angles'].append(simulation.creature_chain.get_angles())
+        expected['voltages'].append(simulation.creature_chain.get_voltages())
+        expected['fired'].append(simulation.creature_chain.swarm.fired.copy())
+    simulation.detach_recorder()
+
+    reader = TrajectoryReader(str(tmp_path))
+    assert len(reader) == 30
+    assert reader.num_creatures == 6
+    assert reader.metadata['run'] == 'test'
+    assert reader.metadata['concentration_handler'] == {'type': 'FicksConcentrationHandler', 'D': 0.002}
+    steps = reader[:]
+    for name, rows in expected.items():
+        rows = np.array(rows)
+        np.testing.assert_array_equal(steps[name], rows.astype(steps[name].dtype))
+    np.testing.assert_allclose(reader.times, np.arange(1, 31) * simulation.dt)
+
+    middle = reader.time_slice(10 * simulation.dt, 20 * simulation.dt)
+    np.testing.assert_array_equal(middle['frames'], np.arange(10, 20))
+    np.testing.assert_array_equal(reader[5:25:5]['positions'], steps['positions'][5:25:5])
@@ -0,0 +1,55 @@
+import pickle
+from dataclasses import replace
+
+import pytest
+
+from evaluation import EvaluationEngine
+from result_cache import ResultCache
+from termination import ReachedTarget
+
+
+def with_simulation(config, **changes):
+    return replace(config, simulation=replace(config.simulation, **changes))
+
+
+def test_key_is_stable_and_sensitive(make_config, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.db'), version='test')
+    config = make_config()
+    key = cache.key(config)
+    assert cache.key(make_config()) == key
+    # a whole number from YAML and the same number from python are one parameter
+    assert cache.key(with_simulation(config, max_time=100)) == key
+    assert ResultCache(str(tmp_path / 'other.db'), version='test').key(config) == key
+
+    assert cache.key(with_simulation(config, seed=8)) != key
+    assert cache.key(config, max_time=50.) != key
+    assert cache.key(config, termination_conditions=[ReachedTarget(20)]) != key
+    assert cache.key(config, termination_conditions=[ReachedTarget(20)]) != \
+        cache.key(config, termination_conditions=[ReachedTarget(30)])
+    assert ResultCache(str(tmp_path / 'cache.db'), version='changed').key(config) != key
+    with pytest.raises(ValueError):
+        cache.key(with_simulation(config, seed=None))
+
+
+def test_put_and_get(make_config, tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache.db'), version='test')
+    key = cache.key(make_config())
+    assert cache.get_many([key]) == {}
+    cache.put(key, make_config(), 12.5, 3., True)
+    # a copy sent to another process opens its own connection to the same database
+    assert pickle.loads(pickle.dumps(cache)).get_many([key, 'missing']) == {key: (12.5, 3., True)}
+    assert len(cache) == 1
+    assert (cache.hits, cache.misses) == (0, 1)
+
+
+def test_engine_reuses_results_across_generations(make_config, tmp_path):
+    engine = EvaluationEngine(num_workers=0, seed=3, cache=ResultCache(str(tmp_path / 'cache.db')))
+    first = [make_config(4, max_time=1., seed=None, fps=15 + i) for i in range(3)]
+    fitnesses = engine.evaluate(first)
+    assert (engine.cache.hits, engine.cache.misses) == (0, 3)
+
+    # the same parameter sets at other positions, plus a new one
+    second = [first[2], make_config(4, max_time=1., seed=None, fps=20), first[0]]
+    again = engine.evaluate(second)
+    assert (engine.cache.hits, engine.cache.misses) == (2, 4)
+    assert again[0] == fitnesses[2] and again[2] == fitnesses[0]
@@ -2,7 +2,7 @@ import numpy as np
 import pygame
 import pymunk
 import math
-from numba import jit
+from numba import jit, prange
 from pymunk.vec2d import Vec2d
 from pymunk.constraints import DampedSpring
 
@@ -15,7 +15,7 @@ def convert_coordinates(point, dispY):
     return int(point[0]), int(dispY - point[1])
 
 
-@jit(nopython=True)
+@jit(nopython=True, cache=True)
 def get_concentration_at_point(point, origin, t, D):
     l2 = (point[0] - origin[0]) ** 2 + (point[1] - origin[1]) ** 2
     if t == 0:
@@ -24,26 +24,37 @@ def get_concentration_at_point(point, origin, t, D):
         return int((60 / (math.sqrt(12.56 * D * t))) * np.exp(-l2 / (4 * D * t)))
 
 
-@jit(nopython=True)
-def get_concentration_array(shape, origin, t, D):
-    rows, columns = shape
-    alphaArr = np.zeros((rows, columns), dtype=np.int32)
-    for i in range(rows):
-        for j in range(columns):
-            point_conc = 255 - get_concentration_at_point((i / rows, j / columns), origin, t, D)
-            if point_conc < 0:
-                alphaArr[i, j] = 0
-            else:
-                alphaArr[i, j] = point_conc
-    return alphaArr
-
-
-@jit(nopython=True)
-def gray(im):
-    w, h = im.shape
-    ret = np.empty((w, h, 3), dtype=np.uint8)
-    ret[:, :, 2] = ret[:, :, 1] = ret[:, :, 0] = im
-    return ret
+@jit(nopython=True, parallel=True, cache=True)
+def get_concentration_array(buffer, origin, t, D, downsample):
+    # writes 255 - concentration into all channels of a preallocated (rows, columns, 3) uint8 buffer
+    # the gaussian is separable, so one exp per row and per column is enough
+    rows, columns = buffer.shape[0], buffer.shape[1]
+    if t == 0:
+        buffer[:] = 0
+        return
+
+    low_rows = (rows + downsample - 1) // downsample
+    low_columns = (columns + downsample - 1) // downsample
+    denominator = 4 * D * t
+    ex = np.empty(low_rows)
+    ey = np.empty(low_columns)
+    for a in range(low_rows):
+        ex[a] = math.exp(-((a * downsample) / rows - origin[0]) ** 2 / denominator)
+    for b in range(low_columns):
+        ey[b] = math.exp(-((b * downsample) / columns - origin[1]) ** 2 / denominator)
+
+    scale = 60 / math.sqrt(12.56 * D * t)
+    for a in prange(low_rows):
+        row_scale = scale * ex[a]
+        for b in range(low_columns):
+            value = 255 - int(row_scale * ey[b])
+            if value < 0:
+                value = 0
+            for i in range(a * downsample, min((a + 1) * downsample, rows)):
+                for j in range(b * downsample, min((b + 1) * downsample, columns)):
+                    buffer[i, j, 0] = value
+                    buffer[i, j, 1] = value
+                    buffer[i, j, 2] = value
 
 
 class Salp:
@@ -182,8 +193,7 @@ class App:
         self.clickTime = 0
         self.clickFlag = False
         self.diffCoeff = 0.002
-        get_concentration_at_point((1, 1), (20, 20), 1, 0.1)  # dummy calls to compile numba function
-        get_concentration_array((10, 10), (5, 5), 2, 0.1)
+        self.downsample = 1  # render the concentration background every downsample pixels
         self.salpChain = SalpChain((1, 1), salpNum, (400, 400), thresholdConst, defaultThresh)
         self.salpChain.thrust = thrust
         self.salpChain.distance = distance
@@ -204,6 +214,7 @@ class App:
         self.salpChain.makeChain()
         self.salpChain.makeConnections()
         columns, rows = pygame.display.get_window_size()
+        background = np.zeros((rows, columns, 3), dtype=np.uint8)
 
         while self.running:
             for event in pygame.event.get():
@@ -224,9 +235,8 @@ class App:
             if self.clickFlag:
                 loopTime = pygame.time.get_ticks()
                 t = (loopTime - self.clickTime) / 1000
-                arr = get_concentration_array((rows, columns), self.unitClickPos, t, self.diffCoeff)
-                grayscaleArr = gray(arr)
-                pygame.surfarray.blit_array(screen, grayscaleArr)
+                get_concentration_array(background, self.unitClickPos, t, self.diffCoeff, self.downsample)
+                pygame.surfarray.blit_array(screen, background)
                 self.salpChain.chainThrust(self.unitClickPos, t, self.diffCoeff)
 
             self.salpChain.drawChain()